@@ -0,0 +1,99 @@
+# _bar_cache.py
+"""
+Caché en dos niveles (memoria + parquet en disco) para velas históricas
+
+Solo debe usarse con ventanas cerradas (completamente en el pasado): sus
+velas ya no cambian, así que basta con descargarlas de MT5 una vez.
+"""
+
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow es opcional: sin él solo se usa la caché en memoria
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path.home() / ".cache" / "noddle_trader"
+MAX_EN_MEMORIA = 128
+
+Key = Tuple[str, str, int, int]
+
+_memoria: "OrderedDict[Key, pd.DataFrame]" = OrderedDict()
+
+
+def clave(symbol: str, timeframe: str, desde: datetime, hasta: datetime) -> Key:
+    """Construir la clave de caché de una ventana (fechas con timezone)"""
+    return symbol, timeframe, int(desde.timestamp()), int(hasta.timestamp())
+
+
+def _ruta(key: Key) -> Path:
+    symbol, timeframe, desde, hasta = key
+    return CACHE_DIR / f"{symbol}_{timeframe}_{desde}_{hasta}.parquet"
+
+
+def _recordar(key: Key, df: pd.DataFrame):
+    _memoria[key] = df
+    _memoria.move_to_end(key)
+    while len(_memoria) > MAX_EN_MEMORIA:
+        _memoria.popitem(last=False)
+
+
+def get(key: Key) -> Optional[pd.DataFrame]:
+    """
+    Buscar una ventana en memoria y, si no está, en disco
+
+    Args:
+        key: Clave devuelta por clave()
+
+    Returns:
+        Copia del DataFrame cacheado o None si no existe
+    """
+    df = _memoria.get(key)
+    if df is not None:
+        _memoria.move_to_end(key)
+        return df.copy()
+
+    if pq is None:
+        return None
+
+    ruta = _ruta(key)
+    if not ruta.exists():
+        return None
+
+    try:
+        df = pq.read_table(ruta, use_threads=True).to_pandas()
+    except Exception as e:
+        logger.warning("No se pudo leer la caché %s: %s", ruta, e)
+        return None
+
+    _recordar(key, df)
+    return df.copy()
+
+
+def put(key: Key, df: pd.DataFrame):
+    """
+    Guardar una ventana cerrada en memoria y en disco
+
+    Args:
+        key: Clave devuelta por clave()
+        df: DataFrame con las velas de la ventana
+    """
+    _recordar(key, df.copy())
+
+    if pq is None:
+        return
+
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(df), _ruta(key), compression="zstd")
+    except Exception as e:
+        logger.warning("No se pudo escribir la caché de %s: %s", key, e)
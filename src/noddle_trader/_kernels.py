@@ -0,0 +1,345 @@
+# _kernels.py
+"""
+Bucles numéricos de la estrategia compilados con Numba
+
+Numba es opcional: sin él, njit no hace nada y cada función exportada usa
+una versión vectorizada con NumPy (o Python normal) con el mismo resultado.
+
+atr (la serie completa) ya no se usa en la estrategia, que solo necesita el
+último valor (atr_actual). Se mantiene como referencia: reproduce el cálculo
+original con pandas y atr_actual debe coincidir con su último valor; también
+sirve para obtener el ATR de cada vela en recorridos por lotes.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+
+    NUMBA_DISPONIBLE = True
+except ImportError:  # numba es opcional: las funciones quedan sin compilar
+    NUMBA_DISPONIBLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
+
+
+# Códigos de resultado de simular_salida
+PENDIENTE = 0
+GANANCIA = 1
+PERDIDA = 2
+
+# Códigos de tipo de entrada de buscar_entrada
+SIN_ENTRADA = 0
+MITIGACION = 1
+CE = 2
+PROXIMIDAD = 3
+
+
+@njit(cache=True)
+def _simular_salida_bucle(
+    lows: np.ndarray, highs: np.ndarray, sl: float, tp: float, es_compra: bool
+) -> int:
+    """Recorrer las velas futuras hasta que se toque el SL o el TP"""
+    for i in range(len(lows)):
+        if es_compra:
+            if lows[i] <= sl:
+                return PERDIDA
+            if highs[i] >= tp:
+                return GANANCIA
+        else:
+            if highs[i] >= sl:
+                return PERDIDA
+            if lows[i] <= tp:
+                return GANANCIA
+    return PENDIENTE
+
+
+def _primer_true(mascara: np.ndarray) -> int:
+    """Índice del primer True o len(mascara) si no hay ninguno"""
+    if len(mascara) == 0:
+        return 0
+    # argmax se detiene en el primer True; si no hay ninguno devuelve 0, así
+    # que basta mirar ese elemento en vez de recorrer otra vez con any()
+    i = int(mascara.argmax())
+    return i if mascara[i] else len(mascara)
+
+
+def _simular_salida_np(
+    lows: np.ndarray, highs: np.ndarray, sl: float, tp: float, es_compra: bool
+) -> int:
+    """Misma lógica que el bucle con dos comparaciones vectorizadas y argmax"""
+    if es_compra:
+        toca_sl = lows <= sl
+        toca_tp = highs >= tp
+    else:
+        toca_sl = highs >= sl
+        toca_tp = lows <= tp
+
+    n = len(lows)
+    primera_sl = _primer_true(toca_sl)
+    primera_tp = _primer_true(toca_tp)
+    if primera_sl == n and primera_tp == n:
+        return PENDIENTE
+    # Si ambos se tocan en la misma vela gana el SL (criterio conservador)
+    return PERDIDA if primera_sl <= primera_tp else GANANCIA
+
+
+# Recorrer las velas futuras hasta que se toque el SL o el TP; en una misma
+# vela el SL tiene prioridad. Devuelve PENDIENTE, GANANCIA o PERDIDA
+simular_salida = _simular_salida_bucle if NUMBA_DISPONIBLE else _simular_salida_np
+
+
+@njit(cache=True)
+def _detectar_fvg_bucle(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    alcista: bool,
+    rango_minimo: float,
+    ancho_minimo: float,
+):
+    """Una sola pasada hacia atrás: rango de las tres velas, hueco y ancho"""
+    n = len(highs)
+    indices = np.empty(max(n, 0), dtype=np.int64)
+    k = 0
+    descartados = 0
+    if n - 5 <= 2:
+        return indices[:0], descartados
+
+    # Validez de la terna (i-2, i-1, i) como ventana deslizante: al bajar i
+    # solo se calcula el rango de la vela nueva (i-2), una vez por vela
+    inicio = n - 5
+    valida_0 = highs[inicio] - lows[inicio] >= rango_minimo
+    valida_1 = highs[inicio - 1] - lows[inicio - 1] >= rango_minimo
+    valida_2 = highs[inicio - 2] - lows[inicio - 2] >= rango_minimo
+    for i in range(inicio, 2, -1):
+        if i != inicio:
+            valida_0 = valida_1
+            valida_1 = valida_2
+            valida_2 = highs[i - 2] - lows[i - 2] >= rango_minimo
+        if not (valida_0 and valida_1 and valida_2):
+            continue
+        if alcista:
+            if not lows[i] > highs[i - 2]:
+                continue
+            ancho = abs(lows[i] - highs[i - 2])
+        else:
+            if not highs[i] < lows[i - 2]:
+                continue
+            ancho = abs(lows[i - 2] - highs[i])
+        if ancho >= ancho_minimo:
+            indices[k] = i
+            k += 1
+        else:
+            descartados += 1
+    return indices[:k], descartados
+
+
+def _detectar_fvg_np(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    alcista: bool,
+    rango_minimo: float,
+    ancho_minimo: float,
+):
+    """Misma lógica que el bucle evaluando todas las ternas a la vez"""
+    n = len(highs)
+    if n - 5 <= 2:
+        return np.empty(0, dtype=np.int64), 0
+
+    # Con slices desplazados la posición j corresponde a la terna que
+    # termina en i = j + 2; solo interesan i en [3, n-5], es decir j en
+    # [1, n-7]. Así no se reúnen elementos con índices (fancy indexing)
+    valida = (highs - lows) >= rango_minimo
+    ternas_validas = valida[1 : n - 6] & valida[2 : n - 5] & valida[3 : n - 4]
+    if alcista:
+        huecos = lows[3 : n - 4] > highs[1 : n - 6]
+    else:
+        huecos = highs[3 : n - 4] < lows[1 : n - 6]
+    # Solo los candidatos, de la terna más reciente a la más antigua
+    i = np.flatnonzero(ternas_validas & huecos)[::-1] + 3
+    if alcista:
+        anchos = np.abs(lows[i] - highs[i - 2])
+    else:
+        anchos = np.abs(lows[i - 2] - highs[i])
+    anchos_validos = anchos >= ancho_minimo
+    return i[anchos_validos], len(i) - int(anchos_validos.sum())
+
+
+# Índices i de las ternas (i-2, i-1, i) que forman un FVG en la dirección
+# pedida, de la más reciente (len-5) a la más antigua (3), y cuántos se
+# descartaron por ancho insuficiente
+detectar_fvg = _detectar_fvg_bucle if NUMBA_DISPONIBLE else _detectar_fvg_np
+
+
+@njit(cache=True)
+def _buscar_entrada_bucle(
+    altos: np.ndarray,
+    bajos: np.ndarray,
+    compras: np.ndarray,
+    r_high: float,
+    r_low: float,
+    r_close: float,
+    tolerancia: float,
+):
+    """Primera oportunidad con entrada: mitigación, CE (50%) o proximidad"""
+    for k in range(len(altos)):
+        alto = altos[k]
+        bajo = bajos[k]
+        ce = (alto + bajo) / 2
+        if compras[k]:
+            if r_low <= alto and r_close > bajo:
+                return k, MITIGACION
+            if r_low <= ce and r_close > ce:
+                return k, CE
+            if abs(r_low - alto) <= tolerancia:
+                return k, PROXIMIDAD
+        else:
+            if r_high >= bajo and r_close < alto:
+                return k, MITIGACION
+            if r_high >= ce and r_close < ce:
+                return k, CE
+            if abs(r_high - bajo) <= tolerancia:
+                return k, PROXIMIDAD
+    return -1, SIN_ENTRADA
+
+
+def _buscar_entrada_np(
+    altos: np.ndarray,
+    bajos: np.ndarray,
+    compras: np.ndarray,
+    r_high: float,
+    r_low: float,
+    r_close: float,
+    tolerancia: float,
+):
+    """Misma lógica que el bucle evaluando todas las oportunidades a la vez"""
+    ce = (altos + bajos) / 2
+    mitigacion = np.where(
+        compras,
+        (r_low <= altos) & (r_close > bajos),
+        (r_high >= bajos) & (r_close < altos),
+    )
+    en_ce = np.where(
+        compras, (r_low <= ce) & (r_close > ce), (r_high >= ce) & (r_close < ce)
+    )
+    proximidad = np.where(
+        compras,
+        np.abs(r_low - altos) <= tolerancia,
+        np.abs(r_high - bajos) <= tolerancia,
+    )
+    # Primera oportunidad con alguna regla cumplida (un solo argmax); el tipo
+    # se decide después solo para ella, en el mismo orden que el bucle
+    k = _primer_true(mitigacion | en_ce | proximidad)
+    if k == len(altos):
+        return -1, SIN_ENTRADA
+    if mitigacion[k]:
+        return k, MITIGACION
+    if en_ce[k]:
+        return k, CE
+    return k, PROXIMIDAD
+
+
+# Recorrer las oportunidades en orden y devolver (k, tipo) de la primera que
+# da entrada con la última vela, o (-1, SIN_ENTRADA). Para cada una se prueba
+# mitigación completa, luego CE (50%) y luego proximidad (tolerancia)
+buscar_entrada = _buscar_entrada_bucle if NUMBA_DISPONIBLE else _buscar_entrada_np
+
+
+@njit(cache=True)
+def _atr_bucle(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, periodo: int):
+    """True range y su media móvil en dos bucles sobre los arreglos"""
+    n = len(highs)
+    tr = np.empty(n, dtype=np.float64)
+    for i in range(n):
+        rango = highs[i] - lows[i]
+        if i > 0:
+            rango = max(
+                rango, abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])
+            )
+        tr[i] = rango
+
+    atr = tr.copy()
+    for i in range(periodo - 1, n):
+        # La ventana se suma completa y en orden (periodo es pequeño): así el
+        # resultado es idéntico al de rolling().mean() de pandas
+        suma = 0.0
+        for k in range(i - periodo + 1, i + 1):
+            suma += tr[k]
+        atr[i] = suma / periodo
+    return atr
+
+
+def _atr_np(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, periodo: int):
+    """Misma lógica que el bucle sumando las ventanas con slices desplazados"""
+    tr = highs - lows
+    if len(tr) > 1:
+        # Máximo acumulado en el propio arreglo (out=), sin apilar los tres
+        # rangos en una matriz ni crear más temporales
+        previos = closes[:-1]
+        np.maximum(tr[1:], np.abs(highs[1:] - previos), out=tr[1:])
+        np.maximum(tr[1:], np.abs(lows[1:] - previos), out=tr[1:])
+    tr = tr.astype(np.float64)
+
+    atr = tr.copy()
+    m = len(tr) - periodo + 1
+    if m > 0:
+        suma = tr[:m].copy()
+        for k in range(1, periodo):
+            suma += tr[k : k + m]
+        atr[periodo - 1 :] = suma / periodo
+    return atr
+
+
+# Average True Range (float64) de cada vela: media de los últimos periodo
+# true range; las primeras periodo - 1 velas usan su propio true range y la
+# primera vela usa high - low
+atr = _atr_bucle if NUMBA_DISPONIBLE else _atr_np
+
+
+@njit(cache=True)
+def _atr_actual_bucle(
+    highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, periodo: int
+) -> float:
+    """Solo el true range de la última ventana, sin arreglos intermedios"""
+    n = len(highs)
+    if n == 0:
+        return 0.0
+    inicio = n - periodo if n >= periodo else n - 1
+    suma = 0.0
+    for i in range(inicio, n):
+        rango = highs[i] - lows[i]
+        if i > 0:
+            rango = max(
+                rango, abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1])
+            )
+        suma += rango
+    return suma / (n - inicio)
+
+
+def _atr_actual_np(
+    highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, periodo: int
+) -> float:
+    """Misma lógica que el bucle con slices de la última ventana"""
+    n = len(highs)
+    if n == 0:
+        return 0.0
+    inicio = n - periodo if n >= periodo else n - 1
+    tr = highs[inicio:] - lows[inicio:]
+    # La primera vela de la serie no tiene cierre previo: queda high - low
+    desde = max(inicio, 1)
+    previos = closes[desde - 1 : n - 1]
+    k = desde - inicio
+    tr[k:] = np.maximum(
+        tr[k:],
+        np.maximum(np.abs(highs[desde:] - previos), np.abs(lows[desde:] - previos)),
+    )
+    # Suma en orden sobre floats de Python, como el bucle
+    return sum(tr.astype(np.float64).tolist()) / len(tr)
+
+
+# ATR de la última vela (el último valor de atr) o 0.0 sin velas. Solo
+# recorre la última ventana de periodo velas
+atr_actual = _atr_actual_bucle if NUMBA_DISPONIBLE else _atr_actual_np
@@ -1,15 +1,186 @@
 # data_feed.py
 import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-import pytz
-from typing import Optional, Dict, List
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone, tzinfo
+from zoneinfo import ZoneInfo
+from typing import Optional, Dict, NamedTuple, Tuple
 import logging
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from . import _bar_cache
+
+try:
+    import numexpr as ne
+except ImportError:  # numexpr es opcional: sin él se usan operaciones NumPy
+    ne = None
 
 # Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+UTC = timezone.utc
+
+# Duración de cada timeframe en segundos
+_TF_SECONDS = {
+    "M1": 60,
+    "M5": 300,
+    "M15": 900,
+    "M30": 1800,
+    "H1": 3600,
+    "H4": 14400,
+    "D1": 86400,
+}
+
+# Sesiones de trading: zona horaria, apertura y cierre (hora local)
+_SESSIONS = {
+    # 9:30 AM - 4:00 PM EST
+    "NY": (ZoneInfo("America/New_York"), time(9, 30), time(16, 0)),
+    # 8:00 AM - 4:30 PM GMT
+    "LONDON": (ZoneInfo("Europe/London"), time(8, 0), time(16, 30)),
+    # 9:00 AM - 6:00 PM JST
+    "ASIA": (ZoneInfo("Asia/Tokyo"), time(9, 0), time(18, 0)),
+}
+
+# Columnas que validar_datos exige en cada DataFrame de velas
+_REQUIRED_LIST = ["open", "high", "low", "close", "tick_volume"]
+_REQUIRED_COLUMNS = frozenset(_REQUIRED_LIST)
+
+
+def _rates_a_df(rates: np.ndarray, copy: bool = False) -> pd.DataFrame:
+    """
+    Convertir el arreglo estructurado de MT5 en un DataFrame indexado por tiempo
+
+    Con copy=False las columnas son vistas de rates cuando el dtype lo
+    permite, así que rates no debe modificarse mientras se use el DataFrame.
+    """
+    idx = pd.DatetimeIndex(pd.to_datetime(rates["time"], unit="s", utc=True))
+    idx.name = "time"
+    columnas = {k: rates[k] for k in rates.dtype.names if k != "time"}
+    return pd.DataFrame(columnas, index=idx, copy=copy)
+
+
+@dataclass(frozen=True)
+class Bars:
+    """
+    Velas OHLC como vistas NumPy sobre el arreglo estructurado devuelto por MT5
+
+    Los campos hl2/hlc3/ohlc4 apuntan a un buffer que el data feed reutiliza
+    entre llamadas: solo son válidos hasta la siguiente descarga del mismo
+    símbolo y timeframe. Usar to_pandas() para obtener una copia independiente.
+    """
+
+    rates: np.ndarray
+    time: np.ndarray  # Segundos desde epoch (UTC)
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    tick_volume: np.ndarray
+    hl2: np.ndarray
+    hlc3: np.ndarray
+    ohlc4: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rates)
+
+    def to_pandas(self, copy: bool = True) -> pd.DataFrame:
+        """
+        Construir el DataFrame indexado por tiempo (solo cuando se necesita)
+
+        Args:
+            copy: Copiar las columnas OHLC; usar False solo si rates no se
+                reutiliza después (p. ej. no es una vista del buffer circular)
+        """
+        df = _rates_a_df(self.rates, copy=copy)
+        df["hl2"] = self.hl2.copy()
+        df["hlc3"] = self.hlc3.copy()
+        df["ohlc4"] = self.ohlc4.copy()
+        return df
+
+
+@dataclass(slots=True, frozen=True)
+class SymbolInfo:
+    """Información estática de un símbolo de MT5"""
+
+    name: str
+    digits: int
+    point: float
+    spread: int  # Spread en puntos al momento de la consulta
+    trade_mode: int
+    min_lot: float
+    max_lot: float
+    lot_step: float
+
+
+class Tick(NamedTuple):
+    """Tick actual de un símbolo"""
+
+    time: int  # Segundos desde epoch (UTC)
+    bid: float
+    ask: float
+    last: float
+    volume: int
+    spread: float
+
+    @property
+    def fecha(self) -> datetime:
+        """Hora del tick como datetime UTC (se calcula solo si se pide)"""
+        return datetime.fromtimestamp(self.time, tz=UTC)
+
+
+class _RatesRing:
+    """Buffer circular con las últimas velas de un símbolo y timeframe"""
+
+    def __init__(self, capacidad: int, dtype: np.dtype):
+        self.data = np.empty(capacidad, dtype=dtype)
+        self.head = 0  # Posición de la próxima escritura
+        self.count = 0
+
+    def ultimo_time(self) -> int:
+        """Tiempo de apertura de la vela más reciente"""
+        return int(self.data[self.head - 1]["time"])
+
+    def agregar(self, rates: np.ndarray):
+        """Añadir velas nuevas (ordenadas) sobrescribiendo las más antiguas"""
+        n = len(rates)
+        capacidad = len(self.data)
+        if n >= capacidad:
+            self.data[:] = rates[-capacidad:]
+            self.head = 0
+            self.count = capacidad
+            return
+
+        fin = self.head + n
+        if fin <= capacidad:
+            self.data[self.head : fin] = rates
+        else:
+            k = capacidad - self.head
+            self.data[self.head :] = rates[:k]
+            self.data[: n - k] = rates[k:]
+        self.head = fin % capacidad
+        self.count = min(capacidad, self.count + n)
+
+    def actualizar_ultima(self, vela: np.void):
+        """Reemplazar la vela más reciente (vela aún en formación)"""
+        self.data[self.head - 1] = vela
+
+    def latest_view(self, n: int) -> np.ndarray:
+        """
+        Últimas n velas en orden cronológico
+
+        Devuelve una vista sin copia cuando las velas son contiguas en el
+        buffer; solo concatena cuando la ventana cruza el final del buffer.
+        """
+        n = min(n, self.count)
+        fin = self.head if self.head else len(self.data)
+        inicio = fin - n
+        if inicio >= 0:
+            return self.data[inicio:fin]
+        return np.concatenate((self.data[inicio:], self.data[:fin]))
+
 
 class MT5DataFeed:
     """
@@ -17,22 +188,46 @@ class MT5DataFeed:
     Optimizada para la estrategia ICT MSS
     """
 
+    # Mapeo de timeframes (compartido por todas las instancias)
+    timeframes = {
+        "M1": mt5.TIMEFRAME_M1,
+        "M5": mt5.TIMEFRAME_M5,
+        "M15": mt5.TIMEFRAME_M15,
+        "M30": mt5.TIMEFRAME_M30,
+        "H1": mt5.TIMEFRAME_H1,
+        "H4": mt5.TIMEFRAME_H4,
+        "D1": mt5.TIMEFRAME_D1,
+    }
+
     def __init__(self):
         """Inicializar la conexión con MetaTrader 5"""
         self.connected = False
-        self.timezone_utc = pytz.timezone("UTC")
-        self.timezone_ny = pytz.timezone("America/New_York")
-
-        # Mapeo de timeframes
-        self.timeframes = {
-            "M1": mt5.TIMEFRAME_M1,
-            "M5": mt5.TIMEFRAME_M5,
-            "M15": mt5.TIMEFRAME_M15,
-            "M30": mt5.TIMEFRAME_M30,
-            "H1": mt5.TIMEFRAME_H1,
-            "H4": mt5.TIMEFRAME_H4,
-            "D1": mt5.TIMEFRAME_D1,
-        }
+        self.timezone_utc = UTC
+
+        # terminal_info() es una llamada IPC al terminal: mientras el último
+        # chequeo tenga menos de _health_ttl segundos se confía en él
+        self._last_health_check: float = 0.0
+        self._health_ttl = 30.0
+        self.timezone_ny = ZoneInfo("America/New_York")
+
+        # Buffers reutilizables para las columnas derivadas, por (símbolo, timeframe)
+        self._buf: Dict[tuple, np.ndarray] = {}
+
+        # Buffers circulares para la descarga incremental de velas
+        self._ring: Dict[str, Dict[str, _RatesRing]] = {}
+        self.velas_incrementales = 3  # Velas pedidas a MT5 en cada actualización
+
+        # La librería de MT5 no garantiza ser reentrante: si el feed se usa
+        # desde varios hilos sus consultas (velas, símbolos y ticks) se
+        # serializan con este lock
+        self._mt5_lock = threading.Lock()
+
+        # Información de símbolos ya consultada (cambia muy poco por sesión)
+        self._symbol_info: Dict[str, SymbolInfo] = {}
+
+        # Horas locales ya convertidas por filtrar_sesion_trading
+        self._tz_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._tz_cache_max = 8
 
         self.connect()
 
@@ -45,17 +240,18 @@ class MT5DataFeed:
         """
         if not mt5.initialize():
             logger.error("Error al inicializar MetaTrader 5")
-            logger.error(f"Error code: {mt5.last_error()}")
+            logger.error("Error code: %s", mt5.last_error())
             return False
 
         self.connected = True
+        self._last_health_check = monotonic()
 
         # Obtener información de la cuenta
         account_info = mt5.account_info()
         if account_info is not None:
-            logger.info(f"Conectado a MT5 - Cuenta: {account_info.login}")
-            logger.info(f"Servidor: {account_info.server}")
-            logger.info(f"Balance: {account_info.balance}")
+            logger.info("Conectado a MT5 - Cuenta: %s", account_info.login)
+            logger.info("Servidor: %s", account_info.server)
+            logger.info("Balance: %s", account_info.balance)
 
         return True
 
@@ -64,41 +260,84 @@ class MT5DataFeed:
         if self.connected:
             mt5.shutdown()
             self.connected = False
+            self._last_health_check = 0.0
             logger.info("Desconectado de MetaTrader 5")
 
     def is_connected(self) -> bool:
-        """Verificar si está conectado a MT5"""
-        return self.connected and mt5.terminal_info() is not None
+        """
+        Verificar si está conectado a MT5
+
+        Solo consulta al terminal si el último chequeo correcto tiene más de
+        _health_ttl segundos o si una llamada a MT5 falló desde entonces.
+        """
+        if not self.connected:
+            return False
+
+        ahora = monotonic()
+        if ahora - self._last_health_check < self._health_ttl:
+            return True
+
+        with self._mt5_lock:
+            ok = mt5.terminal_info() is not None
+        self._last_health_check = ahora if ok else 0.0
+        return ok
+
+    def _invalidar_conexion(self):
+        """Forzar la consulta al terminal en el próximo is_connected()"""
+        self._last_health_check = 0.0
 
-    def get_symbol_info(self, symbol: str) -> Optional[Dict]:
+    def get_symbol_info(self, symbol: str) -> Optional[SymbolInfo]:
         """
         Obtener información del símbolo
 
+        El resultado se guarda por símbolo; usar refresh_symbol_info() para
+        volver a consultarlo (p. ej. si se necesita el spread actualizado).
+
         Args:
             symbol: Símbolo a consultar
 
         Returns:
-            Diccionario con información del símbolo o None
+            SymbolInfo con información del símbolo o None
         """
+        cached = self._symbol_info.get(symbol)
+        if cached is not None:
+            return cached
+
         if not self.is_connected():
             logger.error("No hay conexión con MT5")
             return None
 
-        symbol_info = mt5.symbol_info(symbol)
+        with self._mt5_lock:
+            symbol_info = mt5.symbol_info(symbol)
         if symbol_info is None:
-            logger.error(f"Símbolo {symbol} no encontrado")
+            self._invalidar_conexion()
+            logger.error("Símbolo %s no encontrado", symbol)
             return None
 
-        return {
-            "name": symbol_info.name,
-            "digits": symbol_info.digits,
-            "point": symbol_info.point,
-            "spread": symbol_info.spread,
-            "trade_mode": symbol_info.trade_mode,
-            "min_lot": symbol_info.volume_min,
-            "max_lot": symbol_info.volume_max,
-            "lot_step": symbol_info.volume_step,
-        }
+        info = SymbolInfo(
+            name=symbol_info.name,
+            digits=symbol_info.digits,
+            point=symbol_info.point,
+            spread=symbol_info.spread,
+            trade_mode=symbol_info.trade_mode,
+            min_lot=symbol_info.volume_min,
+            max_lot=symbol_info.volume_max,
+            lot_step=symbol_info.volume_step,
+        )
+        self._symbol_info[symbol] = info
+        return info
+
+    def refresh_symbol_info(self, symbol: Optional[str] = None):
+        """
+        Descartar la información de símbolos guardada
+
+        Args:
+            symbol: Símbolo a refrescar; None descarta todos
+        """
+        if symbol is None:
+            self._symbol_info.clear()
+        else:
+            self._symbol_info.pop(symbol, None)
 
     def obtener_datos_historicos(
         self, symbol: str, timeframe: str, desde: datetime, hasta: datetime
@@ -106,6 +345,9 @@ class MT5DataFeed:
         """
         Obtener datos históricos con manejo de errores mejorado
 
+        Las ventanas ya cerradas se sirven desde la caché de velas (memoria y
+        parquet en disco) y solo se descargan de MT5 la primera vez.
+
         Args:
             symbol: Símbolo a consultar
             timeframe: Marco temporal ('M1', 'M15', etc.)
@@ -115,59 +357,162 @@ class MT5DataFeed:
         Returns:
             DataFrame con datos históricos
         """
-        if not self.is_connected():
-            logger.error("No hay conexión con MT5")
-            return pd.DataFrame()
-
         if timeframe not in self.timeframes:
-            logger.error(f"Timeframe {timeframe} no válido")
+            logger.error("Timeframe %s no válido", timeframe)
             return pd.DataFrame()
 
         try:
-            # Convertir fechas a UTC si no están en UTC
+            # Convertir fechas a UTC si no están en UTC (las fechas sin
+            # timezone se interpretan como UTC)
             if desde.tzinfo is None:
-                desde = self.timezone_utc.localize(desde)
+                desde = desde.replace(tzinfo=UTC)
             else:
-                desde = desde.astimezone(self.timezone_utc)
+                desde = desde.astimezone(UTC)
 
             if hasta.tzinfo is None:
-                hasta = self.timezone_utc.localize(hasta)
+                hasta = hasta.replace(tzinfo=UTC)
             else:
-                hasta = hasta.astimezone(self.timezone_utc)
-
-            # Obtener datos
-            mt5_timeframe = self.timeframes[timeframe]
-            rates = mt5.copy_rates_range(symbol, mt5_timeframe, desde, hasta)
+                hasta = hasta.astimezone(UTC)
 
-            if rates is None or len(rates) == 0:
-                logger.warning(f"No se obtuvieron datos para {symbol} {timeframe}")
-                logger.warning(f"Error MT5: {mt5.last_error()}")
+            # Una ventana está cerrada si su última vela ya terminó
+            cache_key = _bar_cache.clave(symbol, timeframe, desde, hasta)
+            ventana_cerrada = hasta <= datetime.now(UTC) - timedelta(
+                seconds=_TF_SECONDS[timeframe]
+            )
+            if ventana_cerrada:
+                df = _bar_cache.get(cache_key)
+                if df is not None:
+                    logger.info(
+                        "Caché: %d registros de %s %s", len(df), symbol, timeframe
+                    )
+                    return df
+
+            if not self.is_connected():
+                logger.error("No hay conexión con MT5")
                 return pd.DataFrame()
 
-            # Crear DataFrame
-            df = pd.DataFrame(rates)
-            df["time"] = pd.to_datetime(df["time"], unit="s", utc=True)
-            df.set_index("time", inplace=True)
+            # Obtener datos
+            rates = self._fetch_range(symbol, timeframe, desde, hasta)
+            if rates is None:
+                return pd.DataFrame()
 
-            # Añadir columnas útiles
-            df["hl2"] = (df["high"] + df["low"]) / 2  # Precio medio
-            df["hlc3"] = (df["high"] + df["low"] + df["close"]) / 3  # Precio típico
-            df["ohlc4"] = (
-                df["open"] + df["high"] + df["low"] + df["close"]
-            ) / 4  # Precio promedio
+            # Buffer de columnas derivadas propio para no competir con las
+            # consultas por velas del mismo símbolo
+            df = self._rates_to_df((symbol, timeframe, "rango"), rates)
 
-            logger.info(f"Obtenidos {len(df)} registros de {symbol} {timeframe}")
+            logger.info("Obtenidos %d registros de %s %s", len(df), symbol, timeframe)
+            if ventana_cerrada:
+                _bar_cache.put(cache_key, df)
             return df
 
         except Exception as e:
-            logger.error(f"Error al obtener datos históricos: {e}")
+            logger.error("Error al obtener datos históricos: %s", e)
             return pd.DataFrame()
 
-    def obtener_datos_por_velas(
+    def _fetch_range(
+        self, symbol: str, timeframe: str, desde: datetime, hasta: datetime
+    ) -> Optional[np.ndarray]:
+        """Descargar de MT5 las velas entre dos fechas (None si no hay datos)"""
+        with self._mt5_lock:
+            rates = mt5.copy_rates_range(
+                symbol, self.timeframes[timeframe], desde, hasta
+            )
+            error = self._error_descarga(rates)
+        return self._verificar_rates(rates, error, symbol, timeframe)
+
+    def _fetch_pos(
         self, symbol: str, timeframe: str, num_velas: int
+    ) -> Optional[np.ndarray]:
+        """Descargar de MT5 las últimas num_velas velas (None si no hay datos)"""
+        with self._mt5_lock:
+            rates = mt5.copy_rates_from_pos(
+                symbol, self.timeframes[timeframe], 0, num_velas
+            )
+            error = self._error_descarga(rates)
+        return self._verificar_rates(rates, error, symbol, timeframe)
+
+    @staticmethod
+    def _error_descarga(rates: Optional[np.ndarray]):
+        """
+        Error de MT5 de una descarga sin velas (None si trajo velas)
+
+        Se llama con el lock tomado, junto a la descarga: así last_error()
+        no puede devolver el error de una descarga de otro hilo
+        """
+        if rates is None or len(rates) == 0:
+            return mt5.last_error()
+        return None
+
+    def _verificar_rates(
+        self, rates: Optional[np.ndarray], error, symbol: str, timeframe: str
+    ) -> Optional[np.ndarray]:
+        """Registrar el error de MT5 cuando una descarga no devuelve velas"""
+        if rates is None or len(rates) == 0:
+            self._invalidar_conexion()
+            logger.warning("No se obtuvieron datos para %s %s", symbol, timeframe)
+            logger.warning("Error MT5: %s", error)
+            return None
+        return rates
+
+    def _rates_to_df(
+        self, key: tuple, rates: np.ndarray, copy: bool = False
     ) -> pd.DataFrame:
         """
-        Obtener un número específico de velas desde ahora hacia atrás
+        Convertir velas de MT5 en DataFrame con hl2, hlc3 y ohlc4
+
+        Es el mismo camino que usan obtener_datos_por_velas e incrementales
+        (Bars.to_pandas), así que las columnas derivadas se calculan siempre
+        igual.
+        """
+        return self._crear_barras(key, rates).to_pandas(copy=copy)
+
+    def _columnas_derivadas(self, key: tuple, rates: np.ndarray) -> np.ndarray:
+        """
+        Calcular hl2, hlc3 y ohlc4 sobre el arreglo estructurado de MT5
+
+        Args:
+            key: Clave (símbolo, timeframe) del buffer a reutilizar
+            rates: Arreglo estructurado devuelto por MT5
+
+        Returns:
+            Arreglo (3, n) con hl2, hlc3 y ohlc4 por filas
+        """
+        n = len(rates)
+        buf = self._buf.get(key)
+        if buf is None or buf.shape[1] != n:
+            buf = np.empty((3, n), dtype=np.float64)
+            self._buf[key] = buf
+
+        hl2, hlc3, ohlc4 = buf
+        if ne is not None:
+            # Cada expresión se evalúa en una sola pasada, sin temporales
+            columnas = {
+                "o": rates["open"],
+                "h": rates["high"],
+                "lo": rates["low"],
+                "c": rates["close"],
+            }
+            ne.evaluate("(h + lo) / 2", local_dict=columnas, out=hl2)
+            ne.evaluate("(h + lo + c) / 3", local_dict=columnas, out=hlc3)
+            ne.evaluate("(o + h + lo + c) / 4", local_dict=columnas, out=ohlc4)
+            return buf
+
+        np.add(rates["high"], rates["low"], out=hl2)
+        np.add(hl2, rates["close"], out=hlc3)
+        hlc3 /= 3
+        hl2 /= 2
+
+        np.add(rates["open"], rates["high"], out=ohlc4)
+        ohlc4 += rates["low"]
+        ohlc4 += rates["close"]
+        ohlc4 /= 4
+        return buf
+
+    def obtener_barras(
+        self, symbol: str, timeframe: str, num_velas: int
+    ) -> Optional[Bars]:
+        """
+        Obtener las últimas velas como arreglos NumPy, sin construir un DataFrame
 
         Args:
             symbol: Símbolo a consultar
@@ -175,40 +520,156 @@ class MT5DataFeed:
             num_velas: Número de velas a obtener
 
         Returns:
-            DataFrame con datos históricos
+            Bars con vistas sobre los datos de MT5 o None si no hay datos
         """
         if not self.is_connected():
             logger.error("No hay conexión con MT5")
-            return pd.DataFrame()
+            return None
 
         if timeframe not in self.timeframes:
-            logger.error(f"Timeframe {timeframe} no válido")
+            logger.error("Timeframe %s no válido", timeframe)
+            return None
+
+        try:
+            rates = self._fetch_pos(symbol, timeframe, num_velas)
+            if rates is None:
+                return None
+
+            return self._crear_barras((symbol, timeframe), rates)
+
+        except Exception as e:
+            logger.error("Error al obtener barras: %s", e)
+            return None
+
+    def obtener_barras_incrementales(
+        self, symbol: str, timeframe: str, num_velas: int
+    ) -> Optional[Bars]:
+        """
+        Obtener las últimas velas descargando de MT5 solo las velas nuevas
+
+        La primera llamada llena un buffer circular de num_velas velas; las
+        siguientes piden solo las últimas velas, reemplazan la vela en
+        formación y añaden las cerradas desde la última consulta. Si el hueco
+        es mayor que lo descargado se vuelve a llenar el buffer completo.
+
+        Args:
+            symbol: Símbolo a consultar
+            timeframe: Marco temporal
+            num_velas: Número de velas a obtener
+
+        Returns:
+            Bars con las últimas num_velas velas o None si no hay datos
+        """
+        if not self.is_connected():
+            logger.error("No hay conexión con MT5")
+            return None
+
+        if timeframe not in self.timeframes:
+            logger.error("Timeframe %s no válido", timeframe)
+            return None
+
+        try:
+            rings = self._ring.setdefault(symbol, {})
+            ring = rings.get(timeframe)
+
+            nuevas = None
+            if ring is not None and ring.count and len(ring.data) >= num_velas:
+                nuevas = self._fetch_pos(symbol, timeframe, self.velas_incrementales)
+                if nuevas is None:
+                    return None
+
+                ultimo = ring.ultimo_time()
+                if nuevas[0]["time"] > ultimo:
+                    # Hueco mayor que la descarga incremental: recargar todo
+                    nuevas = None
+                else:
+                    nuevas = nuevas[nuevas["time"] >= ultimo]
+                    if len(nuevas):
+                        ring.actualizar_ultima(nuevas[0])
+                        ring.agregar(nuevas[1:])
+
+            if nuevas is None:
+                rates = self._fetch_pos(symbol, timeframe, num_velas)
+                if rates is None:
+                    return None
+                ring = _RatesRing(num_velas, rates.dtype)
+                ring.agregar(rates)
+                rings[timeframe] = ring
+
+            return self._crear_barras((symbol, timeframe), ring.latest_view(num_velas))
+
+        except Exception as e:
+            logger.error("Error al obtener barras incrementales: %s", e)
+            return None
+
+    def _crear_barras(self, key: tuple, rates: np.ndarray) -> Bars:
+        """Envolver el arreglo estructurado de MT5 en un Bars"""
+        hl2, hlc3, ohlc4 = self._columnas_derivadas(key, rates)
+        return Bars(
+            rates=rates,
+            time=rates["time"],
+            open=rates["open"],
+            high=rates["high"],
+            low=rates["low"],
+            close=rates["close"],
+            tick_volume=rates["tick_volume"],
+            hl2=hl2,
+            hlc3=hlc3,
+            ohlc4=ohlc4,
+        )
+
+    def obtener_datos_por_velas(
+        self, symbol: str, timeframe: str, num_velas: int
+    ) -> pd.DataFrame:
+        """
+        Obtener un número específico de velas desde ahora hacia atrás
+
+        Args:
+            symbol: Símbolo a consultar
+            timeframe: Marco temporal
+            num_velas: Número de velas a obtener
+
+        Returns:
+            DataFrame con datos históricos
+        """
+        barras = self.obtener_barras(symbol, timeframe, num_velas)
+        if barras is None:
             return pd.DataFrame()
 
         try:
-            mt5_timeframe = self.timeframes[timeframe]
-            rates = mt5.copy_rates_from_pos(symbol, mt5_timeframe, 0, num_velas)
+            # rates viene recién descargado de MT5 y no se reutiliza
+            return barras.to_pandas(copy=False)
 
-            if rates is None or len(rates) == 0:
-                logger.warning(f"No se obtuvieron datos para {symbol} {timeframe}")
-                return pd.DataFrame()
+        except Exception as e:
+            logger.error("Error al obtener datos por velas: %s", e)
+            return pd.DataFrame()
 
-            df = pd.DataFrame(rates)
-            df["time"] = pd.to_datetime(df["time"], unit="s", utc=True)
-            df.set_index("time", inplace=True)
+    def obtener_datos_incrementales(
+        self, symbol: str, timeframe: str, num_velas: int
+    ) -> pd.DataFrame:
+        """
+        Equivalente a obtener_datos_por_velas usando el buffer incremental
+
+        Args:
+            symbol: Símbolo a consultar
+            timeframe: Marco temporal
+            num_velas: Número de velas a obtener
 
-            # Añadir columnas calculadas
-            df["hl2"] = (df["high"] + df["low"]) / 2
-            df["hlc3"] = (df["high"] + df["low"] + df["close"]) / 3
-            df["ohlc4"] = (df["open"] + df["high"] + df["low"] + df["close"]) / 4
+        Returns:
+            DataFrame con las últimas num_velas velas
+        """
+        barras = self.obtener_barras_incrementales(symbol, timeframe, num_velas)
+        if barras is None:
+            return pd.DataFrame()
 
-            return df
+        try:
+            return barras.to_pandas()
 
         except Exception as e:
-            logger.error(f"Error al obtener datos por velas: {e}")
+            logger.error("Error al obtener datos incrementales: %s", e)
             return pd.DataFrame()
 
-    def obtener_tick_actual(self, symbol: str) -> Optional[Dict]:
+    def obtener_tick_actual(self, symbol: str) -> Optional[Tick]:
         """
         Obtener el tick actual del símbolo
 
@@ -216,23 +677,20 @@ class MT5DataFeed:
             symbol: Símbolo a consultar
 
         Returns:
-            Diccionario con información del tick actual
+            Tick con la información del tick actual
         """
         if not self.is_connected():
             return None
 
-        tick = mt5.symbol_info_tick(symbol)
+        with self._mt5_lock:
+            tick = mt5.symbol_info_tick(symbol)
         if tick is None:
+            self._invalidar_conexion()
             return None
 
-        return {
-            "time": datetime.fromtimestamp(tick.time, tz=pytz.UTC),
-            "bid": tick.bid,
-            "ask": tick.ask,
-            "last": tick.last,
-            "volume": tick.volume,
-            "spread": tick.ask - tick.bid,
-        }
+        return Tick(
+            tick.time, tick.bid, tick.ask, tick.last, tick.volume, tick.ask - tick.bid
+        )
 
     def filtrar_sesion_trading(
         self, df: pd.DataFrame, sesion: str = "NY"
@@ -250,34 +708,37 @@ class MT5DataFeed:
         if df.empty:
             return df
 
-        df_copy = df.copy()
+        if sesion not in _SESSIONS:
+            return df
 
-        # Convertir índice a timezone NY para filtrado
-        if sesion == "NY":
-            df_ny = df_copy.tz_convert("America/New_York")
-            # Sesión de NY: 9:30 AM - 4:00 PM EST
-            mask = (df_ny.index.time >= datetime.strptime("09:30", "%H:%M").time()) & (
-                df_ny.index.time <= datetime.strptime("16:00", "%H:%M").time()
-            )
-            return df_copy[mask]
-
-        elif sesion == "LONDON":
-            df_london = df_copy.tz_convert("Europe/London")
-            # Sesión de Londres: 8:00 AM - 4:30 PM GMT
-            mask = (
-                df_london.index.time >= datetime.strptime("08:00", "%H:%M").time()
-            ) & (df_london.index.time <= datetime.strptime("16:30", "%H:%M").time())
-            return df_copy[mask]
-
-        elif sesion == "ASIA":
-            df_tokyo = df_copy.tz_convert("Asia/Tokyo")
-            # Sesión de Asia: 9:00 AM - 6:00 PM JST
-            mask = (
-                df_tokyo.index.time >= datetime.strptime("09:00", "%H:%M").time()
-            ) & (df_tokyo.index.time <= datetime.strptime("18:00", "%H:%M").time())
-            return df_copy[mask]
-
-        return df_copy
+        # Convertir índice a la timezone de la sesión para filtrado; la
+        # indexación booleana ya devuelve un DataFrame nuevo
+        tz, apertura, cierre = _SESSIONS[sesion]
+        idx_time = self._horas_locales(df.index, tz)
+        mask = (idx_time >= apertura) & (idx_time <= cierre)
+        return df[mask]
+
+    def _horas_locales(self, index: pd.DatetimeIndex, tz: tzinfo) -> np.ndarray:
+        """
+        Hora local (datetime.time) de cada vela, reutilizando conversiones previas
+
+        La clave incluye el tamaño y los extremos del índice y se confirma
+        comparando los timestamps, así que un DataFrame reconstruido con las
+        mismas velas (p. ej. el buffer incremental sin velas nuevas) reutiliza
+        la conversión sin riesgo de devolver horas de otro índice.
+        """
+        valores = index.asi8
+        key = (tz, len(valores), int(valores[0]), int(valores[-1]))
+        cached = self._tz_cache.get(key)
+        if cached is not None and np.array_equal(cached[0], valores):
+            self._tz_cache.move_to_end(key)
+            return cached[1]
+
+        idx_time = index.tz_convert(tz).time
+        self._tz_cache[key] = (valores.copy(), idx_time)
+        if len(self._tz_cache) > self._tz_cache_max:
+            self._tz_cache.popitem(last=False)
+        return idx_time
 
     def validar_datos(self, df: pd.DataFrame) -> bool:
         """
@@ -293,31 +754,50 @@ class MT5DataFeed:
             return False
 
         # Verificar columnas necesarias
-        required_columns = ["open", "high", "low", "close", "tick_volume"]
-        if not all(col in df.columns for col in required_columns):
+        if not _REQUIRED_COLUMNS.issubset(df.columns):
             logger.error("Faltan columnas necesarias en los datos")
             return False
 
         # Verificar valores faltantes
-        if df[required_columns].isnull().any().any():
+        block = df[_REQUIRED_LIST].to_numpy(dtype=np.float64, copy=False)
+        if np.isnan(block).any():
             logger.warning("Encontrados valores faltantes en los datos")
 
-        # Verificar lógica de precios OHLC
-        invalid_ohlc = (
-            (df["high"] < df["low"])
-            | (df["high"] < df["open"])
-            | (df["high"] < df["close"])
-            | (df["low"] > df["open"])
-            | (df["low"] > df["close"])
-        )
+        # Verificar lógica de precios OHLC: el máximo debe cubrir el cuerpo
+        # de la vela y el mínimo quedar por debajo
+        o = df["open"].to_numpy()
+        h = df["high"].to_numpy()
+        lows = df["low"].to_numpy()
+        c = df["close"].to_numpy()
+        invalid_ohlc = (h < np.maximum(o, c)) | (lows > np.minimum(o, c)) | (h < lows)
 
-        if invalid_ohlc.any():
-            logger.warning(
-                f"Encontradas {invalid_ohlc.sum()} velas con lógica OHLC inválida"
-            )
+        n_invalidas = int(invalid_ohlc.sum())
+        if n_invalidas:
+            logger.warning("Encontradas %d velas con lógica OHLC inválida", n_invalidas)
 
         return True
 
+    def obtener_datos_multi_timeframe(
+        self, symbol: str, velas_m15: int, velas_m1: int
+    ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Descargar M15 y M1 usando el buffer incremental
+
+        Las descargas van una tras otra: las llamadas a MT5 se serializan de
+        todos modos y el post-procesado de unas pocas velas es mínimo
+
+        Args:
+            symbol: Símbolo a analizar
+            velas_m15: Número de velas M15 a obtener
+            velas_m1: Número de velas M1 a obtener
+
+        Returns:
+            Tuple con (df_m15, df_m1)
+        """
+        df_m15 = self.obtener_datos_incrementales(symbol, "M15", velas_m15)
+        df_m1 = self.obtener_datos_incrementales(symbol, "M1", velas_m1)
+        return df_m15, df_m1
+
     def obtener_datos_para_estrategia(
         self, symbol: str, velas_m15: int = 50, velas_m1: int = 200
     ) -> tuple:
@@ -332,13 +812,10 @@ class MT5DataFeed:
         Returns:
             Tuple con (df_m15, df_m1)
         """
-        logger.info(f"Obteniendo datos para estrategia: {symbol}")
-
-        # Obtener datos M15
-        df_m15 = self.obtener_datos_por_velas(symbol, "M15", velas_m15)
+        logger.info("Obteniendo datos para estrategia: %s", symbol)
 
-        # Obtener datos M1
-        df_m1 = self.obtener_datos_por_velas(symbol, "M1", velas_m1)
+        # Obtener datos M15 y M1
+        df_m15, df_m1 = self.obtener_datos_multi_timeframe(symbol, velas_m15, velas_m1)
 
         # Validar datos
         if not self.validar_datos(df_m15):
@@ -349,20 +826,45 @@ class MT5DataFeed:
             logger.error("Datos M1 inválidos")
             return pd.DataFrame(), pd.DataFrame()
 
-        # Filtrar por sesión NY
-        df_m15_ny = self.filtrar_sesion_trading(df_m15, "NY")
-        df_m1_ny = self.filtrar_sesion_trading(df_m1, "NY")
+        # Filtrar por sesión NY solo para informar: si el nivel INFO está
+        # desactivado no vale la pena calcularlo
+        if logger.isEnabledFor(logging.INFO):
+            df_m15_ny = self.filtrar_sesion_trading(df_m15, "NY")
+            df_m1_ny = self.filtrar_sesion_trading(df_m1, "NY")
 
-        logger.info(
-            f"Datos M15: {len(df_m15)} velas total, {len(df_m15_ny)} en sesión NY"
-        )
-        logger.info(f"Datos M1: {len(df_m1)} velas total, {len(df_m1_ny)} en sesión NY")
+            logger.info(
+                "Datos M15: %d velas total, %d en sesión NY",
+                len(df_m15),
+                len(df_m15_ny),
+            )
+            logger.info(
+                "Datos M1: %d velas total, %d en sesión NY", len(df_m1), len(df_m1_ny)
+            )
 
         return df_m15, df_m1
 
 
-# Instancia global del data feed
-data_feed = MT5DataFeed()
+# Mapeo inverso de constantes de MT5 a timeframe en texto
+_MT5_TF_TO_STR = {v: k for k, v in MT5DataFeed.timeframes.items()}
+
+# Instancia global del data feed, creada (y conectada) en el primer uso
+_data_feed: Optional[MT5DataFeed] = None
+
+
+def get_data_feed() -> MT5DataFeed:
+    """
+    Obtener la instancia global del data feed
+
+    La conexión con MT5 se establece en la primera llamada y no al importar
+    el módulo, para que importarlo no bloquee ni requiera el terminal.
+
+    Returns:
+        Instancia compartida de MT5DataFeed
+    """
+    global _data_feed
+    if _data_feed is None:
+        _data_feed = MT5DataFeed()
+    return _data_feed
 
 
 # Funciones de compatibilidad con el código existente
@@ -381,24 +883,14 @@ def obtener_datos_r(
     Returns:
         DataFrame con datos
     """
-    # Mapear timeframe de MT5 a string
-    timeframe_map = {
-        mt5.TIMEFRAME_M1: "M1",
-        mt5.TIMEFRAME_M5: "M5",
-        mt5.TIMEFRAME_M15: "M15",
-        mt5.TIMEFRAME_M30: "M30",
-        mt5.TIMEFRAME_H1: "H1",
-        mt5.TIMEFRAME_H4: "H4",
-        mt5.TIMEFRAME_D1: "D1",
-    }
-
-    tf_str = timeframe_map.get(timeframe, "M15")
-    return data_feed.obtener_datos_historicos(symbol, tf_str, desde, hasta)
+    tf_str = _MT5_TF_TO_STR.get(timeframe, "M15")
+    return get_data_feed().obtener_datos_historicos(symbol, tf_str, desde, hasta)
 
 
 def obtener_datos():
     """Función de compatibilidad para obtener datos de ejemplo"""
     symbol = "EURUSD"
+    data_feed = get_data_feed()
 
     print("🔄 Obteniendo datos con sistema mejorado...")
 
@@ -426,21 +918,23 @@ def obtener_datos():
     symbol_info = data_feed.get_symbol_info(symbol)
     if symbol_info:
         print(f"\n💰 Info del símbolo {symbol}:")
-        print(f"Dígitos: {symbol_info['digits']}")
-        print(f"Spread: {symbol_info['spread']} puntos")
-        print(f"Lote mín: {symbol_info['min_lot']}")
+        print(f"Dígitos: {symbol_info.digits}")
+        print(f"Spread: {symbol_info.spread} puntos")
+        print(f"Lote mín: {symbol_info.min_lot}")
 
     # Tick actual
     tick = data_feed.obtener_tick_actual(symbol)
     if tick:
         print(f"\n⚡ Tick actual:")
-        print(f"Bid: {tick['bid']:.5f}")
-        print(f"Ask: {tick['ask']:.5f}")
-        print(f"Spread: {tick['spread']*10000:.1f} pips")
+        print(f"Bid: {tick.bid:.5f}")
+        print(f"Ask: {tick.ask:.5f}")
+        print(f"Spread: {tick.spread*10000:.1f} pips")
 
 
 if __name__ == "__main__":
+    # La configuración de logging corresponde al script, no al módulo
+    logging.basicConfig(level=logging.INFO)
     try:
         obtener_datos()
     finally:
-        data_feed.disconnect()
+        get_data_feed().disconnect()
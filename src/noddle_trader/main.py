@@ -3,9 +3,9 @@ import pandas as pd
 from datetime import datetime, timedelta
 import time
 import json
+import logging
 
-# Asegúrate de que la importación usa la nueva clase de data_feed
-from .data_feed import data_feed # Importar la instancia global
+from .data_feed import get_data_feed
 from .strategy import ICTMSSStrategy
 import MetaTrader5 as mt5
 
@@ -24,15 +24,35 @@ def cargar_configuracion():
         "VELAS_M15": 100,                 # Analizar el M15 de las últimas 7.5 horas
         "VELAS_M1": 100,                  # Ventana en M1 para buscar FVG
         "USAR_FILTRO_SESION": False,      # True para operar solo en sesión NY, False para operar 24h
+        "SAVE_ANALYSIS": True,            # False para no guardar un TOML por análisis (backtests)
+        "FLUSH_EVERY": 1,                 # Análisis por lote enviado al escritor (más alto en backtests)
+        "PRECIOS_FLOAT32": False,         # True para analizar precios en float32 (menos memoria, ~7 dígitos)
         
         # --- Parámetros de Ejecución ---
         "INTERVALO_ANALISIS": 60,        # Chequeo cada 15 segundos
+        "ALINEAR_A_VELA": True,          # Despertar al cierre de cada vela M1 en vez de cada INTERVALO_ANALISIS
     }
 
 
+def segundos_hasta_proxima_vela(segundos_vela=60, margen=0.2):
+    """
+    Segundos que faltan para el cierre de la vela en curso
+
+    Args:
+        segundos_vela: Duración de la vela en segundos (60 para M1)
+        margen: Espera extra para que MT5 ya tenga la vela nueva
+
+    Returns:
+        Segundos a dormir (nunca menos de 0.1)
+    """
+    ahora = time.time()
+    proxima = (int(ahora) // segundos_vela + 1) * segundos_vela
+    return max(0.1, proxima - ahora + margen)
+
+
 def obtener_datos_estrategia(symbol, velas_m15, velas_m1):
     """
-    Obtener datos históricos necesarios para la estrategia usando el nuevo data_feed.
+    Obtener datos históricos necesarios para la estrategia usando el buffer incremental del data_feed.
 
     Args:
         symbol: Símbolo a analizar
@@ -42,8 +62,8 @@ def obtener_datos_estrategia(symbol, velas_m15, velas_m1):
     Returns:
         Tuple con (df_m15, df_m1)
     """
-    df_m15 = data_feed.obtener_datos_por_velas(symbol, "M15", velas_m15)
-    df_m1 = data_feed.obtener_datos_por_velas(symbol, "M1", velas_m1)
+    data_feed = get_data_feed()
+    df_m15, df_m1 = data_feed.obtener_datos_multi_timeframe(symbol, velas_m15, velas_m1)
     
     # Validar datos
     if not data_feed.validar_datos(df_m15) or not data_feed.validar_datos(df_m1):
@@ -90,7 +110,11 @@ def modo_tiempo_real(estrategia, config):
     """Ejecutar estrategia en tiempo real"""
     print("🔴 Iniciando análisis en tiempo real (Estrategia Mejorada)...")
     print(f"📊 Símbolo: {config['SYMBOL']}")
-    print(f"⏰ Intervalo: {config['INTERVALO_ANALISIS']} segundos")
+    alinear = config.get("ALINEAR_A_VELA", False)
+    if alinear:
+        print("⏰ Intervalo: al cierre de cada vela M1")
+    else:
+        print(f"⏰ Intervalo: {config['INTERVALO_ANALISIS']} segundos")
     print(f"⏳ Filtro de Sesión NY: {'Activado' if config['USAR_FILTRO_SESION'] else 'Desactivado'}")
     print("Presiona Ctrl+C para detener\n")
 
@@ -110,10 +134,14 @@ def modo_tiempo_real(estrategia, config):
                     mostrar_señal(señal)
                     print("⚠️  MODO DEMO: No se ejecuta operación real. Registrando para estadísticas.")
                     estrategia.registrar_operacion({"resultado": "pendiente", **señal}) # Simulación
-                    time.sleep(60) # Pausa después de señal para no operar la misma vela
+                    if not alinear:
+                        time.sleep(60) # Pausa después de señal para no operar la misma vela
                 
-            # Esperar próximo análisis
-            time.sleep(config["INTERVALO_ANALISIS"])
+            # Esperar próximo análisis (alineado, ya no se repite la misma vela M1)
+            if alinear:
+                time.sleep(segundos_hasta_proxima_vela())
+            else:
+                time.sleep(config["INTERVALO_ANALISIS"])
 
     except KeyboardInterrupt:
         print("\n🛑 Deteniendo análisis...")
@@ -124,13 +152,17 @@ def modo_tiempo_real(estrategia, config):
 
 def main():
     """Función principal"""
-    # La instancia global de data_feed ya se conecta en data_feed.py
+    # La configuración del logging es de la aplicación, no de los módulos
+    logging.basicConfig(level=logging.INFO)
+    config = cargar_configuracion()
+
+    # La conexión con MT5 se establece al crear la instancia global
+    data_feed = get_data_feed()
     if not data_feed.is_connected():
         print("❌ Error al conectar con MetaTrader 5. Revisa data_feed.py")
         return
-        
+
     try:
-        config = cargar_configuracion()
         estrategia = ICTMSSStrategy(config)
 
         print("🤖 NODDLE TRADER - Estrategia ICT FVG (Mejorada)")
@@ -141,6 +173,7 @@ def main():
     finally:
         estrategia.generar_reporte_analisis()
         print("🔄 Generando reporte de análisis...")
+        estrategia.close()
         data_feed.disconnect()
         print("✅ Conexión MT5 cerrada")
 
@@ -1,16 +1,389 @@
 import pandas as pd
 import numpy as np
-from datetime import datetime, time
-from typing import Dict, Optional, Tuple, List
+import atexit
+import copy
+import queue
+import threading
+from collections import Counter, deque
+from datetime import datetime, time, timezone
+from time import time_ns
+from typing import Dict, Optional, Tuple, List, NamedTuple
 import logging
-import toml
+import json
+import tomllib
+import tomli_w
 import os
 from pathlib import Path
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+from . import _kernels
+
+try:
+    import bottleneck as bn
+except ImportError:  # bottleneck es opcional: se usa _SwingRolling / NumPy
+    bn = None
+
+logger = logging.getLogger(__name__)
+
+_NS_POR_DIA = 86_400 * 10**9
+# Duración de una vela de M1 y de M15 en nanosegundos
+_NS_M1 = 60 * 10**9
+_NS_M15 = 15 * _NS_M1
+
+
+def _ns_del_dia(t: time) -> int:
+    """Nanosegundos desde la medianoche hasta la hora t"""
+    segundos = (t.hour * 60 + t.minute) * 60 + t.second
+    return segundos * 10**9 + t.microsecond * 1000
+
+
+# Memoria de FVG/IFVG: los 3 más recientes de cada análisis delante de los 5
+# primeros que ya estaban guardados
+MEMORIA_NUEVOS = 3
+MEMORIA_ANTERIORES = 5
+MEMORIA_MAX = MEMORIA_NUEVOS + MEMORIA_ANTERIORES
+
+
+def _actualizar_memoria(memoria: deque, detectados: List[Dict]):
+    """Guardar los nuevos detectados al frente de la memoria acotada"""
+    while len(memoria) > MEMORIA_ANTERIORES:
+        memoria.pop()
+    memoria.extendleft(reversed(detectados[:MEMORIA_NUEVOS]))
+
+
+def _tiempos(index: pd.Index) -> np.ndarray:
+    """Tiempos del índice como arreglo ordenable (int64 si es DatetimeIndex)"""
+    if isinstance(index, pd.DatetimeIndex):
+        return index.asi8
+    return index.to_numpy()
+
+
+class _Bars(NamedTuple):
+    """
+    Columnas de un DataFrame de velas como arreglos NumPy (SoA)
+
+    ts son nanosegundos UTC. index es el índice original cuando las velas
+    vienen de un DataFrame; sin él las fechas se construyen desde ts. Solo
+    se extraen las columnas que usa el análisis (open no interviene).
+    """
+
+    ts: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    index: Optional[pd.Index] = None
+
+    @classmethod
+    def desde_df(cls, df: pd.DataFrame, dtype: Optional[type] = None) -> "_Bars":
+        """Con dtype=None las columnas se devuelven sin convertir (sin copia)"""
+        return cls(
+            _tiempos(df.index),
+            df["high"].to_numpy(dtype=dtype),
+            df["low"].to_numpy(dtype=dtype),
+            df["close"].to_numpy(dtype=dtype),
+            df.index,
+        )
+
+    def fecha(self, i: int) -> pd.Timestamp:
+        """Fecha de la vela i"""
+        if self.index is not None:
+            return self.index[i]
+        return pd.Timestamp(self.ts[i], tz="UTC")
+
+    def ventana(self, inicio: int, fin: int) -> "_Bars":
+        """Velas [inicio, fin) como vistas, sin copiar"""
+        return _Bars(*(None if c is None else c[inicio:fin] for c in self))
+
+    def filtrar(self, mask: np.ndarray) -> "_Bars":
+        """Velas que cumplen la máscara"""
+        return _Bars(*(None if c is None else c[mask] for c in self))
+
+
+def _extremos_posteriores(closes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mínimo y máximo de closes[i:] para cada i, en una pasada cada uno
+
+    Tienen un elemento más al final (+inf / -inf) para las posiciones sin
+    velas posteriores.
+    """
+    minimos = np.empty(len(closes) + 1, dtype=closes.dtype)
+    maximos = np.empty(len(closes) + 1, dtype=closes.dtype)
+    minimos[-1], maximos[-1] = np.inf, -np.inf
+    np.minimum.accumulate(closes[::-1], out=minimos[-2::-1])
+    np.maximum.accumulate(closes[::-1], out=maximos[-2::-1])
+    return minimos, maximos
+
+
+class _Texto(NamedTuple):
+    """Texto del análisis que solo se formatea al guardarlo"""
+
+    plantilla: str
+    valores: tuple
+
+    def __str__(self) -> str:
+        return self.plantilla.format(*self.valores)
+
+
+def _para_toml(valor):
+    """
+    Copia lista para TOML: sin claves con None (TOML no tiene null; toml las
+    omitía) y con los _Texto ya formateados
+    """
+    if isinstance(valor, _Texto):
+        return str(valor)
+    if isinstance(valor, dict):
+        return {k: _para_toml(v) for k, v in valor.items() if v is not None}
+    if isinstance(valor, list):
+        return [_para_toml(v) for v in valor]
+    return valor
+
+
+# Valor por defecto de las secciones que faltan (solo se lee, nunca se
+# modifica): evita crear un dict vacío por cada análisis
+_VACIO: Dict = {}
+
+
+def _resumen_analisis(data: Dict) -> Dict:
+    """
+    Lo que cuenta el reporte consolidado de un análisis, en una sección
+    plana que se escribe junto con el análisis
+    """
+    resumen = {}
+    resultado = data.get("resultado", _VACIO)
+    resumen["señal_generada"] = resultado.get("señal_generada", False)
+    if not resumen["señal_generada"]:
+        resumen["razon_rechazo"] = resultado.get("razon", "Sin razón")
+
+    sesgo = data.get("analisis_sesgo", _VACIO).get("sesgo_determinado")
+    resumen["sesgo"] = sesgo if sesgo in ["alcista", "bajista"] else "indefinido"
+
+    analisis_fvg = data.get("analisis_fvg", _VACIO)
+    resumen["total_fvg"] = len(analisis_fvg.get("fvg_detectados", []))
+
+    # Una sola pasada por el texto: se parte en "mitigado" y se busca
+    # "completamente" solo en lo que queda a cada lado (no se solapan)
+    antes, mitigado, despues = (analisis_fvg.get("razon_entrada") or "").partition(
+        "mitigado"
+    )
+    if mitigado:
+        resumen["tipo_entrada"] = (
+            "mitigacion_completa"
+            if "completamente" in despues or "completamente" in antes
+            else "mitigacion_proximidad"
+        )
+    return resumen
+
+
+class _EstadoReporte:
+    """
+    Totales del reporte consolidado acumulados análisis por análisis
+
+    Cada archivo se suma una sola vez (al escribirlo o, si no lo escribió
+    esta instancia, la primera vez que se lee), así generar_reporte_analisis
+    no vuelve a leer todos los TOML en cada llamada. El estado se guarda
+    junto al reporte para que otra ejecución tampoco tenga que releerlos.
+    """
+
+    def __init__(self):
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.procesados = set()
+        # Se sobrescribió un archivo ya contado: hay que volver a leerlos
+        self.desactualizado = False
+        self.señales_generadas = 0
+        self.señales_rechazadas = 0
+        # Counter: una sola operación por clave nueva o existente
+        self.razones_rechazo = Counter()
+        self.sesgos_detectados = Counter({"alcista": 0, "bajista": 0, "indefinido": 0})
+        self.tipos_entrada = Counter()
+        self.total_fvg = 0
+
+    def agregar(self, nombre: str, data: Dict):
+        """Sumar el análisis guardado en el archivo nombre"""
+        if nombre in self.procesados:
+            self.desactualizado = True
+        # Los archivos escritos con la sección resumen no se recorren
+        resumen = data.get("resumen") or _resumen_analisis(data)
+
+        if resumen["señal_generada"]:
+            self.señales_generadas += 1
+        else:
+            self.señales_rechazadas += 1
+            self.razones_rechazo[resumen["razon_rechazo"]] += 1
+
+        self.sesgos_detectados[resumen["sesgo"]] += 1
+        self.total_fvg += resumen["total_fvg"]
+
+        tipo = resumen.get("tipo_entrada")
+        if tipo:
+            self.tipos_entrada[tipo] += 1
+
+        self.procesados.add(nombre)
+
+    def como_dict(self) -> Dict:
+        """Estado serializable (para guardarlo entre ejecuciones)"""
+        return {
+            "procesados": sorted(self.procesados),
+            "señales_generadas": self.señales_generadas,
+            "señales_rechazadas": self.señales_rechazadas,
+            "razones_rechazo": dict(self.razones_rechazo),
+            "sesgos_detectados": dict(self.sesgos_detectados),
+            "tipos_entrada": dict(self.tipos_entrada),
+            "total_fvg": self.total_fvg,
+        }
+
+    def cargar(self, datos: Dict):
+        """Continuar desde un estado guardado con como_dict"""
+        self.reiniciar()
+        self.procesados = set(datos.get("procesados", []))
+        self.señales_generadas = datos.get("señales_generadas", 0)
+        self.señales_rechazadas = datos.get("señales_rechazadas", 0)
+        self.razones_rechazo = Counter(datos.get("razones_rechazo", {}))
+        self.sesgos_detectados.update(datos.get("sesgos_detectados", {}))
+        self.tipos_entrada = Counter(datos.get("tipos_entrada", {}))
+        self.total_fvg = datos.get("total_fvg", 0)
+
+    def reporte(self, total_analisis: int) -> Dict:
+        """Reporte consolidado con los totales acumulados"""
+        return {
+            "total_analisis": total_analisis,
+            "señales_generadas": self.señales_generadas,
+            "señales_rechazadas": self.señales_rechazadas,
+            "razones_rechazo": dict(self.razones_rechazo),
+            "sesgos_detectados": dict(self.sesgos_detectados),
+            "tipos_entrada": dict(self.tipos_entrada),
+            "estadisticas_fvg": {
+                "total_detectados": self.total_fvg,
+                "promedio_por_analisis": (
+                    self.total_fvg / total_analisis if total_analisis else 0
+                ),
+            },
+        }
+
+
+# Una línea JSON con el resumen de cada análisis guardado, para que el
+# reporte no tenga que abrir y parsear cada TOML
+RESUMENES_JSONL = "resumenes_analisis.jsonl"
+
+
+def _escritor_analisis(cola: queue.Queue):
+    """
+    Hilo que guarda en disco los lotes de análisis encolados, en orden
+
+    Termina al recibir None (ver ICTMSSStrategy.close)
+    """
+    while True:
+        item = cola.get()
+        if item is None:
+            cola.task_done()
+            return
+        lote, estado = item
+        lineas = []
+        try:
+            for filepath, analysis_data in lote:
+                try:
+                    # Los textos se formatean aquí, fuera del hilo del análisis
+                    analysis_data = _para_toml(analysis_data)
+                    analysis_data["resumen"] = _resumen_analisis(analysis_data)
+                    # tomli_w serializa bastante más rápido que toml.dump
+                    with open(filepath, "wb") as f:
+                        tomli_w.dump(analysis_data, f)
+                    # Solo los archivos escritos cuentan en el reporte
+                    estado.agregar(filepath.name, analysis_data)
+                    lineas.append(
+                        json.dumps(
+                            {"archivo": filepath.name, **analysis_data["resumen"]},
+                            ensure_ascii=False,
+                        )
+                        + "\n"
+                    )
+                    logger.info("analisis=guardado ruta=%s", filepath)
+                except Exception as e:
+                    logger.error("Error al guardar análisis: %s", e)
+            if lineas:
+                # Un solo append por lote
+                with open(
+                    filepath.parent / RESUMENES_JSONL, "a", encoding="utf-8"
+                ) as f:
+                    f.writelines(lineas)
+        except Exception as e:
+            logger.error("Error al guardar resúmenes: %s", e)
+        finally:
+            cola.task_done()
+
+
+class _SwingRolling:
+    """
+    Swing high/low de las últimas N velas con colas monótonas
+
+    Las velas cerradas se añaden una sola vez a dos deques (máximos
+    decrecientes y mínimos crecientes), así que cada llamada cuesta O(1)
+    amortizado en vez de recorrer las N velas. La última vela del DataFrame
+    puede seguir en formación, por eso no entra en las colas y se compara
+    aparte en cada llamada.
+    """
+
+    def __init__(self, ventana: int):
+        self.ventana = ventana
+        self._hi = deque()  # (time, high)
+        self._lo = deque()  # (time, low)
+        self._ultima = None  # (time, high, low) de la última vela cerrada añadida
+        self._cubierto = None  # Tiempo desde el que las colas están completas
+
+    def actualizar(
+        self, tiempos: np.ndarray, highs: np.ndarray, lows: np.ndarray
+    ) -> Tuple[float, float]:
+        """
+        Añadir las velas cerradas nuevas y devolver (swing_high, swing_low)
+
+        Si el DataFrame no continúa al de la llamada anterior (primera
+        llamada, hueco mayor que la ventana, ventana que empieza antes de lo
+        ya procesado o la última vela cerrada añadida llega con otro tiempo,
+        máximo o mínimo) las colas se reconstruyen con la ventana actual.
+        """
+        n = len(tiempos)
+        inicio = n - min(self.ventana, n)
+
+        corte = tiempos[inicio]
+        desde = inicio
+        if self._ultima is not None and corte >= self._cubierto:
+            p = int(np.searchsorted(tiempos, self._ultima[0]))
+            if (
+                inicio - 1 <= p < n - 1
+                and (tiempos[p], highs[p], lows[p]) == self._ultima
+            ):
+                desde = p + 1
+        if desde == inicio:
+            self._hi.clear()
+            self._lo.clear()
+
+        hi, lo = self._hi, self._lo
+        for i in range(desde, n - 1):
+            t, alto, bajo = tiempos[i], highs[i], lows[i]
+            while hi and hi[-1][1] <= alto:
+                hi.pop()
+            hi.append((t, alto))
+            while lo and lo[-1][1] >= bajo:
+                lo.pop()
+            lo.append((t, bajo))
+        if n >= 2:
+            self._ultima = (tiempos[n - 2], highs[n - 2], lows[n - 2])
+        else:
+            self._ultima = None
+        self._cubierto = corte
+
+        # Descartar las velas que ya salieron de la ventana
+        while hi and hi[0][0] < corte:
+            hi.popleft()
+        while lo and lo[0][0] < corte:
+            lo.popleft()
+
+        high, low = highs[-1], lows[-1]
+        if hi and hi[0][1] > high:
+            high = hi[0][1]
+        if lo and lo[0][1] < low:
+            low = lo[0][1]
+        return high, low
 
 
 class ICTMSSStrategy:
@@ -25,14 +398,19 @@ class ICTMSSStrategy:
 
     def __init__(self, config: Dict):
         self.TOLERANCIA_MITIGACION = config.get("TOLERANCIA_MITIGACION", 0.015)
-        self.fvg_memoria = []
-        self.ifvg_memoria = []  # Nueva memoria para IFVGs
-        logging.info("🚀 Inicializando la estrategia ICTMSSStrategy optimizada...")
+        self.fvg_memoria = deque(maxlen=MEMORIA_MAX)
+        self.ifvg_memoria = deque(maxlen=MEMORIA_MAX)  # Nueva memoria para IFVGs
+        logger.info("🚀 Inicializando la estrategia ICTMSSStrategy optimizada...")
 
         self.CUENTA_INICIAL = config.get("CUENTA_INICIAL", 10000)
         self.RIESGO_POR_OPERACION = config.get("RIESGO_POR_OPERACION", 0.01)
         self.RR = config.get("RR", 2)
         self.VALOR_POR_PIP = config.get("VALOR_POR_PIP", 10)
+        # Lote por unidad de precio de SL (constante durante la ejecución):
+        # riesgo en USD / (10000 pips por unidad * USD por pip)
+        self._lote_coef = (self.CUENTA_INICIAL * self.RIESGO_POR_OPERACION) / (
+            10000.0 * self.VALOR_POR_PIP
+        )
 
         self.MIN_VELAS_M15 = config.get("VELAS_M15", 20)
         self.MIN_VELAS_M1 = config.get("VELAS_M1", 50)
@@ -48,57 +426,206 @@ class ICTMSSStrategy:
         )  # Min FVG width % of ATR
         self.UMBRAL_SESION = config.get("UMBRAL_SESION", 0.0002)
         self.RANGO_MINIMO_VELA = config.get("RANGO_MINIMO_VELA", 0.0003)
-
-        self.operaciones = []
+        # float32 basta para ~5 decimales de FX y reduce a la mitad los bytes
+        # recorridos en cada análisis; desactivado para conservar float64
+        self.PRECIOS_FLOAT32 = config.get("PRECIOS_FLOAT32", False)
+        self._dtype_precios = np.float32 if self.PRECIOS_FLOAT32 else None
+
+        # (timestamp_ns, operacion) de cada operación; ver la propiedad
+        # operaciones para la forma pública
+        self._operaciones = []
+        # Acumuladores de obtener_estadisticas, actualizados al registrar
+        self._acumulado = dict.fromkeys(
+            (
+                "ganadas",
+                "ganancia_fvg",
+                "perdida_fvg",
+                "ganancia_ifvg",
+                "perdida_ifvg",
+                "ganancia_ce",
+                "perdida_ce",
+                "operaciones_fvg",
+                "operaciones_ifvg",
+                "operaciones_ce",
+            ),
+            0,
+        )
         self.ultimo_sesgo_valido = None
-
-        # Configuración para almacenamiento de análisis
+        self._swing_m15 = _SwingRolling(self.MIN_VELAS_M15)
+        self._swings_previos = None  # Ver precalcular_swings
+        self._sesgo_cache_key = None
+        self._sesgo_cache_val = None
+        # Posiciones en sesión de los últimos índices filtrados (M15 y M1)
+        self._sesion_cache = {}
+
+        # Configuración para almacenamiento de análisis. La escritura la hace
+        # un hilo aparte para no bloquear el análisis con E/S de disco
+        self.SAVE_ANALYSIS = config.get("SAVE_ANALYSIS", True)
+        # Análisis que se juntan antes de pasarlos al escritor (1 = cada uno)
+        self.FLUSH_EVERY = max(1, config.get("FLUSH_EVERY", 1))
+        self._lote_analisis = []
+        self._cola_analisis = queue.Queue()
+        self._escritor = None
+        self._estado_reporte = _EstadoReporte()
         self.output_dir = Path("output")
         self.output_dir.mkdir(exist_ok=True)
         self.analysis_counter = 0
+        self._estado_path = self.output_dir / ".estado_reporte.toml"
+        self._cargar_estado_reporte()
+        # (clave, reporte) del último reporte generado, ver _clave_reporte
+        self._reporte_cache = None
 
-        logging.info(f"📁 Directorio de salida configurado: {self.output_dir}")
+        logger.info("📁 Directorio de salida configurado: %s", self.output_dir)
+
+    def precalcular_swings(self, df_m15: pd.DataFrame):
+        """
+        Precalcular el swing high/low de cada ventana de N velas de M15
 
-    def _calcular_atr(self, df: pd.DataFrame, periodo: int = 14) -> pd.Series:
-        """Calcula el Average True Range (ATR) para filtrado dinámico"""
-        high_low = df["high"] - df["low"]
-        high_close = np.abs(df["high"] - df["close"].shift())
-        low_close = np.abs(df["low"] - df["close"].shift())
-        tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-        atr = tr.rolling(periodo).mean().fillna(tr)
-        return atr
+        Pensado para backtests que recorren un histórico conocido: los
+        extremos de todas las ventanas se calculan una vez y cada análisis
+        solo busca su vela. Si la ventana analizada no coincide con el
+        histórico (vela en formación distinta, huecos por filtros) se usa el
+        cálculo incremental de siempre.
+        """
+        velas = _Bars.desde_df(df_m15, self._dtype_precios)
+        n = self.MIN_VELAS_M15
+        if len(velas.ts) < n:
+            self._swings_previos = None
+            return
+        if bn is not None:
+            # move_max/move_min recorren la serie una vez, sin depender de N
+            swing_h = bn.move_max(velas.high, n)[n - 1 :]
+            swing_l = bn.move_min(velas.low, n)[n - 1 :]
+        else:
+            ventanas_h = np.lib.stride_tricks.sliding_window_view(velas.high, n)
+            ventanas_l = np.lib.stride_tricks.sliding_window_view(velas.low, n)
+            swing_h = ventanas_h.max(axis=1)
+            swing_l = ventanas_l.min(axis=1)
+        self._swings_previos = (velas.ts, velas.high, velas.low, swing_h, swing_l)
+        logger.info("Swings M15 precalculados para %d ventanas", len(swing_h))
+
+    def _swing_precalculado(
+        self, tiempos: np.ndarray, highs: np.ndarray, lows: np.ndarray
+    ) -> Optional[Tuple[float, float]]:
+        """(swing_high, swing_low) precalculado de la ventana o None"""
+        ts, hs, ls, swing_h, swing_l = self._swings_previos
+        n = self.MIN_VELAS_M15
+        p = int(np.searchsorted(ts, tiempos[-1]))
+        inicio = p - n + 1
+        if (
+            inicio < 0
+            or p >= len(ts)
+            or ts[p] != tiempos[-1]
+            or ts[inicio] != tiempos[-n]
+            or hs[p] != highs[-1]
+            or ls[p] != lows[-1]
+        ):
+            return None
+        return swing_h[inicio], swing_l[inicio]
 
     def _filtrar_sesion_ny(self, df: pd.DataFrame) -> pd.DataFrame:
         """Filtra para mantener solo sesiones de alta liquidez (London/NY overlap)"""
         if not self.USAR_FILTRO_SESION:
-            logging.debug("Filtro de sesión desactivado. Usando todos los datos.")
+            logger.debug("Filtro de sesión desactivado. Usando todos los datos.")
             return df
 
-        df_copy = df.copy()
-        if df_copy.index.tz is None:
-            df_copy.index = df_copy.index.tz_localize("UTC")
-
-        df_ny = df_copy.tz_convert("America/New_York")
         hora_inicio, hora_fin = self.SESION_ALTA_LIQUIDEZ
-        mask = (df_ny.index.time >= hora_inicio) & (df_ny.index.time <= hora_fin)
-        df_filtrado = df_copy[mask]
+        if hora_inicio == time.min and hora_fin == time.max:
+            # La ventana cubre el día completo: no hay nada que filtrar
+            return df
 
-        logging.info(
-            f"Filtradas {len(df_filtrado)} de {len(df_copy)} velas (sesión alta liquidez)."
+        index = df.index
+        if index.tz is None:
+            index = index.tz_localize("UTC")
+        posiciones = self._posiciones_sesion(index)
+        if len(posiciones) == len(df):
+            # Todas las velas están en sesión: no hace falta indexar (solo se
+            # cambia el índice si era naive, sin copiar los datos)
+            return df if df.index.tz is not None else df.set_axis(index)
+
+        # take con posiciones es más barato que la indexación booleana
+        df_filtrado = df.take(posiciones)
+        if df.index.tz is None:
+            df_filtrado.index = index.take(posiciones)
+
+        logger.info(
+            "filtro_sesion velas=%d total=%d",
+            len(df_filtrado),
+            len(df),
         )
         return df_filtrado
 
+    def _posiciones_sesion(self, index: pd.DatetimeIndex) -> np.ndarray:
+        """
+        Posiciones del índice (con zona horaria) dentro de la sesión de NY
+
+        En tiempo real se vuelve a analizar la misma ventana de velas hasta
+        que abre una nueva, así que el resultado se guarda por índice. La
+        clave usa el tamaño y los extremos del índice y se confirma
+        comparando los timestamps (como _horas_locales en data_feed): otro
+        índice con los mismos extremos no reutiliza posiciones ajenas.
+        """
+        hora_inicio, hora_fin = self.SESION_ALTA_LIQUIDEZ
+        ns = index.asi8
+        key = (len(ns), ns[0], ns[-1], hora_inicio, hora_fin) if len(ns) else None
+        cached = self._sesion_cache.get(key)
+        if cached is not None and np.array_equal(cached[0], ns):
+            return cached[1]
+
+        if hora_inicio > hora_fin:
+            # Como la comparación original inicio <= hora <= fin: una ventana
+            # que cruzaría la medianoche no deja ninguna vela
+            # (indexer_between_time la tomaría como inicio-medianoche-fin)
+            posiciones = np.empty(0, dtype=np.intp)
+        else:
+            # Posiciones directamente sobre el índice (en C), sin máscara
+            # intermedia
+            posiciones = index.tz_convert("America/New_York").indexer_between_time(
+                hora_inicio, hora_fin
+            )
+        if len(self._sesion_cache) >= 4:
+            self._sesion_cache.clear()
+        self._sesion_cache[key] = (ns.copy(), posiciones)
+        return posiciones
+
+    def _mascara_sesion_ny(self, index: pd.DatetimeIndex) -> Optional[np.ndarray]:
+        """
+        Máscara de velas dentro de SESION_ALTA_LIQUIDEZ (hora de NY)
+
+        Returns:
+            Máscara booleana o None si la ventana cubre el día completo
+        """
+        hora_inicio, hora_fin = self.SESION_ALTA_LIQUIDEZ
+        if hora_inicio == time.min and hora_fin == time.max:
+            # La ventana cubre el día completo: no hay nada que filtrar
+            return None
+
+        # Comparar nanosegundos desde la medianoche de NY sobre int64 en vez
+        # de construir objetos datetime.time para cada vela
+        ns_local = index.tz_convert("America/New_York").tz_localize(None).asi8
+        ns_del_dia = ns_local % _NS_POR_DIA
+        # inicio <= hora <= fin: con inicio > fin no queda ninguna vela
+        desde = ns_del_dia >= _ns_del_dia(hora_inicio)
+        hasta = ns_del_dia <= _ns_del_dia(hora_fin)
+        return desde & hasta
+
     def _determinar_sesgo_m15(
-        self, df_m15: pd.DataFrame
+        self, df_m15: Optional[pd.DataFrame], velas: Optional[_Bars] = None
     ) -> Tuple[Optional[str], Optional[float], Dict]:
         """
         Determina el sesgo y retorna información detallada para almacenamiento
+
+        Acepta el DataFrame de M15 o directamente sus velas como arreglos.
         """
-        logging.info("--- 1. Analizando sesgo en M15 ---")
+        logger.info("paso=1 analisis=sesgo_m15")
+
+        if velas is None:
+            velas = _Bars.desde_df(df_m15)
+        n_velas = len(velas.close)
 
         analysis_data = {
-            "timestamp": datetime.now().isoformat(),
-            "velas_disponibles": len(df_m15),
+            "timestamp": None,  # Se completa al guardar el análisis
+            "velas_disponibles": n_velas,
             "velas_minimas_requeridas": self.MIN_VELAS_M15,
             "sesgo_determinado": None,
             "razon_sesgo": None,
@@ -109,91 +636,132 @@ class ICTMSSStrategy:
             "ultimo_sesgo_valido_usado": self.ultimo_sesgo_valido,
         }
 
-        if len(df_m15) < self.MIN_VELAS_M15:
+        if n_velas < self.MIN_VELAS_M15:
             analysis_data["sesgo_determinado"] = None
-            analysis_data["razon_sesgo"] = (
-                f"Velas insuficientes: {len(df_m15)} < {self.MIN_VELAS_M15}"
+            analysis_data["razon_sesgo"] = _Texto(
+                "Velas insuficientes: {} < {}", (n_velas, self.MIN_VELAS_M15)
             )
-            logging.warning(
-                f"No hay suficientes velas en M15 ({len(df_m15)} de {self.MIN_VELAS_M15})."
+            logger.warning(
+                "No hay suficientes velas en M15 (%d de %d).",
+                n_velas,
+                self.MIN_VELAS_M15,
             )
             return None, None, analysis_data
 
-        ultimas = df_m15.tail(self.MIN_VELAS_M15)
-        high, low, precio = (
-            ultimas["high"].max(),
-            ultimas["low"].min(),
-            ultimas.iloc[-1]["close"],
+        # El sesgo solo depende de la ventana de N velas (identificada por
+        # sus extremos y por la vela en formación) y del último sesgo válido
+        tiempos, highs, lows, closes = velas.ts, velas.high, velas.low, velas.close
+        key = (
+            n_velas,
+            tiempos[-1],
+            tiempos[-self.MIN_VELAS_M15],
+            highs[-1],
+            lows[-1],
+            closes[-1],
+            self.ultimo_sesgo_valido,
+        )
+        if key == self._sesgo_cache_key:
+            sesgo, nivel, datos, self.ultimo_sesgo_valido = self._sesgo_cache_val
+            logger.debug("Sesgo M15 sin cambios desde el último análisis.")
+            # La marca de tiempo se pone al guardar, sobre una copia
+            return sesgo, nivel, datos
+
+        sesgo, nivel, datos = self._calcular_sesgo_m15(
+            tiempos, highs, lows, closes, analysis_data
         )
+        self._sesgo_cache_key = key
+        self._sesgo_cache_val = (sesgo, nivel, datos, self.ultimo_sesgo_valido)
+        return sesgo, nivel, datos
+
+    def _calcular_sesgo_m15(
+        self,
+        tiempos: np.ndarray,
+        highs: np.ndarray,
+        lows: np.ndarray,
+        closes: np.ndarray,
+        analysis_data: Dict,
+    ) -> Tuple[Optional[str], Optional[float], Dict]:
+        """Aplica las reglas de sesgo sobre las últimas N velas de M15"""
+        # Swing high/low precalculado o incremental sobre las últimas N velas
+        swing = None
+        if self._swings_previos is not None:
+            swing = self._swing_precalculado(tiempos, highs, lows)
+        if swing is None and bn is not None:
+            # Con N pequeño un recorrido en C de la ventana sale más barato
+            # que mantener las colas monótonas en Python
+            n = self.MIN_VELAS_M15
+            swing = bn.nanmax(highs[-n:]), bn.nanmin(lows[-n:])
+        if swing is None:
+            swing = self._swing_m15.actualizar(tiempos, highs, lows)
+        high, low = swing
+        # Un solo paso a float de Python: las reglas de abajo comparan
+        # escalares y no necesitan la maquinaria de escalares NumPy
+        high, low = float(high), float(low)
+        precio = float(closes[-1])
+        primer_cierre = float(closes[-self.MIN_VELAS_M15])
 
         analysis_data.update(
             {
-                "precio_actual": float(precio),
-                "swing_high": float(high),
-                "swing_low": float(low),
+                "precio_actual": precio,
+                "swing_high": high,
+                "swing_low": low,
             }
         )
 
-        logging.info(
-            f"Swing High: {high:.5f}, Swing Low: {low:.5f}, Precio actual: {precio:.5f}"
-        )
+        logger.info("swing_high=%.5f swing_low=%.5f precio=%.5f", high, low, precio)
 
         # Lógica de determinación de sesgo
         if precio > high:
             analysis_data["sesgo_determinado"] = "alcista"
             analysis_data["razon_sesgo"] = "Precio rompió swing high"
-            logging.info("✅ Sesgo ALCISTA confirmado.")
+            logger.info("sesgo=alcista razon=ruptura_swing_high")
             self.ultimo_sesgo_valido = "alcista"
             return "alcista", high, analysis_data
 
         elif precio < low:
             analysis_data["sesgo_determinado"] = "bajista"
             analysis_data["razon_sesgo"] = "Precio rompió swing low"
-            logging.info("✅ Sesgo BAJISTA confirmado.")
+            logger.info("sesgo=bajista razon=ruptura_swing_low")
             self.ultimo_sesgo_valido = "bajista"
             return "bajista", low, analysis_data
 
         elif precio > high - self.UMBRAL_SESION:
             analysis_data["sesgo_determinado"] = "alcista"
-            analysis_data["razon_sesgo"] = (
-                f"Precio cerca de swing high (umbral: {self.UMBRAL_SESION})"
+            analysis_data["razon_sesgo"] = _Texto(
+                "Precio cerca de swing high (umbral: {})", (self.UMBRAL_SESION,)
             )
-            logging.info("⚠️ Sesgo ALCISTA suave (umbral alcanzado).")
+            logger.info("sesgo=alcista razon=umbral_swing_high")
             self.ultimo_sesgo_valido = "alcista"
             return "alcista", high, analysis_data
 
         elif precio < low + self.UMBRAL_SESION:
             analysis_data["sesgo_determinado"] = "bajista"
-            analysis_data["razon_sesgo"] = (
-                f"Precio cerca de swing low (umbral: {self.UMBRAL_SESION})"
+            analysis_data["razon_sesgo"] = _Texto(
+                "Precio cerca de swing low (umbral: {})", (self.UMBRAL_SESION,)
             )
-            logging.info("⚠️ Sesgo BAJISTA suave (umbral alcanzado).")
+            logger.info("sesgo=bajista razon=umbral_swing_low")
             self.ultimo_sesgo_valido = "bajista"
             return "bajista", low, analysis_data
 
         # Calcular tendencia reciente
-        tendencia = ultimas["close"].iloc[-1] - ultimas["close"].iloc[0]
-        analysis_data["tendencia_calculada"] = float(tendencia)
+        tendencia = precio - primer_cierre
+        analysis_data["tendencia_calculada"] = tendencia
 
         if tendencia > 0:
             analysis_data["sesgo_determinado"] = "alcista"
-            analysis_data["razon_sesgo"] = (
-                f"Tendencia alcista por desplazamiento: {tendencia:.5f}"
-            )
-            logging.info(
-                "📈 Tendencia alcista detectada por desplazamiento de precio. Aplicando sesgo ALCISTA."
+            analysis_data["razon_sesgo"] = _Texto(
+                "Tendencia alcista por desplazamiento: {:.5f}", (tendencia,)
             )
+            logger.info("sesgo=alcista razon=desplazamiento tendencia=%.5f", tendencia)
             self.ultimo_sesgo_valido = "alcista"
             return "alcista", high, analysis_data
 
         elif tendencia < 0:
             analysis_data["sesgo_determinado"] = "bajista"
-            analysis_data["razon_sesgo"] = (
-                f"Tendencia bajista por desplazamiento: {tendencia:.5f}"
-            )
-            logging.info(
-                "📉 Tendencia bajista detectada por desplazamiento de precio. Aplicando sesgo BAJISTA."
+            analysis_data["razon_sesgo"] = _Texto(
+                "Tendencia bajista por desplazamiento: {:.5f}", (tendencia,)
             )
+            logger.info("sesgo=bajista razon=desplazamiento tendencia=%.5f", tendencia)
             self.ultimo_sesgo_valido = "bajista"
             return "bajista", low, analysis_data
 
@@ -201,53 +769,64 @@ class ICTMSSStrategy:
         if self.ultimo_sesgo_valido:
             analysis_data["sesgo_determinado"] = self.ultimo_sesgo_valido
             analysis_data["razon_sesgo"] = "Usando último sesgo válido"
-            logging.info("Sesgo indefinido. Aplicando último sesgo válido.")
+            logger.info("sesgo=%s razon=ultimo_valido", self.ultimo_sesgo_valido)
             return self.ultimo_sesgo_valido, None, analysis_data
 
         analysis_data["sesgo_determinado"] = None
         analysis_data["razon_sesgo"] = "No se pudo determinar sesgo"
-        logging.info("No se pudo determinar sesgo.")
+        logger.info("sesgo=indefinido")
         return None, None, analysis_data
 
     def _calcular_ce(self, fvg: Dict) -> float:
         """Calcula el punto Consequent Encroachment (50% del FVG)"""
         return (fvg["fvg_alto"] + fvg["fvg_bajo"]) / 2
 
-    def _fvg_valido(self, fvg: Dict, atr: float) -> bool:
-        """Determina si un FVG es válido basado en la volatilidad actual"""
-        fvg_width = abs(fvg["fvg_alto"] - fvg["fvg_bajo"])
-        min_width = atr * self.FVG_MIN_PCT_ATR
-        return fvg_width >= min_width
+    def _detectar_inversion_fvg(
+        self, extremos: Tuple[np.ndarray, np.ndarray], fvg: Dict
+    ) -> bool:
+        """
+        Detecta si un FVG ha sido invalidado (convertido en IFVG)
 
-    def _detectar_inversion_fvg(self, df_m1: pd.DataFrame, fvg: Dict) -> bool:
-        """Detecta si un FVG ha sido invalidado (convertido en IFVG)"""
-        idx = fvg["indice"]
-        # Revisar velas posteriores al FVG
-        for j in range(idx + 1, len(df_m1)):
-            vela = df_m1.iloc[j]
+        extremos son el mínimo y el máximo de los cierres desde cada vela
+        (ver _extremos_posteriores), así que cada FVG se revisa en O(1).
+        """
+        minimos, maximos = extremos
+        # Cierres posteriores al FVG (sin velas posteriores queda el último
+        # elemento, +-inf, que nunca invalida)
+        i = min(fvg["indice"] + 1, len(minimos) - 1)
 
-            # Para FVG alcista: invalidado si cierra por debajo del mínimo
-            if fvg["direccion"] == "compra" and vela["close"] < fvg["fvg_bajo"]:
-                return True
+        # Para FVG alcista: invalidado si cierra por debajo del mínimo
+        if fvg["direccion"] == "compra":
+            return bool(minimos[i] < fvg["fvg_bajo"])
 
-            # Para FVG bajista: invalidado si cierra por encima del máximo
-            elif fvg["direccion"] == "venta" and vela["close"] > fvg["fvg_alto"]:
-                return True
+        # Para FVG bajista: invalidado si cierra por encima del máximo
+        if fvg["direccion"] == "venta":
+            return bool(maximos[i] > fvg["fvg_alto"])
 
         return False
 
     def _buscar_fvg_y_entrada_m1(
-        self, df_m1: pd.DataFrame, sesgo: str
+        self, df_m1: Optional[pd.DataFrame], sesgo: str, velas: Optional[_Bars] = None
     ) -> Tuple[Optional[Dict], Dict]:
-        """Busca FVG y retorna señal de entrada con optimizaciones de investigación"""
-        logging.info("--- 2. Buscando FVG/IFVG en M1 con optimizaciones ---")
+        """
+        Busca FVG y retorna señal de entrada con optimizaciones de investigación
+
+        Acepta el DataFrame de M1 o directamente sus velas como arreglos.
+        """
+        logger.info("paso=2 analisis=fvg_m1")
+
+        if velas is None:
+            velas = _Bars.desde_df(df_m1)
+        n_velas = len(velas.close)
 
         # Calcular ATR para filtrado dinámico
-        atr_series = self._calcular_atr(df_m1, self.ATR_PERIODO)
-        current_atr = atr_series.iloc[-1] if not atr_series.empty else 0
+        # Solo se usa el ATR de la última vela
+        current_atr = _kernels.atr_actual(
+            velas.high, velas.low, velas.close, self.ATR_PERIODO
+        )
 
         analysis_data = {
-            "velas_m1_disponibles": len(df_m1),
+            "velas_m1_disponibles": n_velas,
             "sesgo_aplicado": sesgo,
             "fvg_detectados": [],
             "ifvg_detectados": [],
@@ -256,227 +835,214 @@ class ICTMSSStrategy:
             "entrada_generada": False,
             "razon_entrada": None,
             "tolerancia_mitigacion": self.TOLERANCIA_MITIGACION,
-            "current_atr": float(current_atr),
+            "current_atr": current_atr,
         }
 
-        if len(df_m1) < 5:
+        if n_velas < 5:
             analysis_data["razon_entrada"] = "Velas insuficientes en M1"
-            logging.warning("No hay suficientes velas en M1 para analizar FVG.")
+            logger.warning("No hay suficientes velas en M1 para analizar FVG.")
             return None, analysis_data
 
-        reciente = df_m1.iloc[-1]
+        # Escalares de Python: compararlos es más barato que con escalares NumPy
+        r_high, r_low, r_close = (
+            float(velas.high[-1]),
+            float(velas.low[-1]),
+            float(velas.close[-1]),
+        )
+        r_time = velas.fecha(-1)
         fvg_detectados = []
         ifvg_detectados = []
 
-        # 1. Detectar nuevos FVGs con filtro de volatilidad
-        for i in range(len(df_m1) - 5, 2, -1):
-            v_previa, v_fvg, v_actual = (
-                df_m1.iloc[i - 2],
-                df_m1.iloc[i - 1],
-                df_m1.iloc[i],
+        # 1. Detectar nuevos FVGs con filtro de volatilidad: rango de cada
+        # vela, hueco de la terna y ancho mínimo (FVG_MIN_PCT_ATR veces el
+        # ATR actual) en una sola pasada, de la terna más reciente a la más
+        # antigua
+        highs, lows = velas.high, velas.low
+        if sesgo in ("alcista", "bajista"):
+            # Umbrales en el dtype de los precios: con PRECIOS_FLOAT32 el
+            # kernel compilado y el de NumPy comparan en float32 por igual
+            precio = highs.dtype.type
+            i, descartados = _kernels.detectar_fvg(
+                highs,
+                lows,
+                sesgo == "alcista",
+                precio(self.RANGO_MINIMO_VELA),
+                precio(current_atr * self.FVG_MIN_PCT_ATR),
             )
-            if not all(map(self._vela_valida, [v_previa, v_fvg, v_actual])):
-                continue
-
-            fvg_info = None
-            if sesgo == "alcista" and v_actual["low"] > v_previa["high"]:
-                fvg_info = {
-                    "direccion": "compra",
-                    "fvg_alto": float(v_actual["low"]),
-                    "fvg_bajo": float(v_previa["high"]),
-                    "stop_loss": float(v_fvg["low"]),
-                    "indice": i,
-                    "timestamp": str(df_m1.index[i]),
-                    "tipo": "fvg",
-                }
-
-            elif sesgo == "bajista" and v_actual["high"] < v_previa["low"]:
-                fvg_info = {
-                    "direccion": "venta",
-                    "fvg_alto": float(v_previa["low"]),
-                    "fvg_bajo": float(v_actual["high"]),
-                    "stop_loss": float(v_fvg["high"]),
-                    "indice": i,
-                    "timestamp": str(df_m1.index[i]),
-                    "tipo": "fvg",
-                }
-
-            if fvg_info:
-                # Filtrar por volatilidad
-                if self._fvg_valido(fvg_info, current_atr):
-                    fvg_detectados.append(fvg_info)
-                    logging.info(f"FVG válido detectado en {fvg_info['timestamp']}")
-                else:
-                    logging.debug(f"FVG descartado por tamaño insuficiente")
-
-        # 2. Verificar inversiones de FVG existentes
-        for fvg in list(self.fvg_memoria):
-            if self._detectar_inversion_fvg(df_m1, fvg):
+        else:
+            i, descartados = np.empty(0, dtype=np.int64), 0
+
+        if sesgo == "alcista":
+            direccion = "compra"
+            altos, bajos, stops = lows[i], highs[i - 2], lows[i - 1]
+        else:
+            direccion = "venta"
+            altos, bajos, stops = lows[i - 2], highs[i], highs[i - 1]
+        if descartados:
+            logger.debug("%d FVG descartados por tamaño insuficiente", descartados)
+
+        # El nivel del logger se consulta una vez por análisis y no por FVG
+        registrar = logger.isEnabledFor(logging.INFO)
+
+        # tolist convierte cada arreglo a escalares de Python de una vez
+        for idx, alto, bajo, stop in zip(
+            i.tolist(), altos.tolist(), bajos.tolist(), stops.tolist()
+        ):
+            fvg_info = {
+                "direccion": direccion,
+                "fvg_alto": alto,
+                "fvg_bajo": bajo,
+                "stop_loss": stop,
+                "indice": idx,
+                "timestamp": str(velas.fecha(idx)),
+                "tipo": "fvg",
+            }
+            fvg_detectados.append(fvg_info)
+            if registrar:
+                logger.info("fvg=detectado ts=%s", fvg_info["timestamp"])
+
+        # 2. Verificar inversiones de FVG existentes. Los FVG que siguen
+        # vigentes se reúnen en una pasada en vez de quitar cada invertido con
+        # deque.remove (búsqueda lineal comparando diccionarios)
+        vigentes = []
+        if self.fvg_memoria:
+            extremos = _extremos_posteriores(velas.close)
+        for fvg in self.fvg_memoria:
+            if not self._detectar_inversion_fvg(extremos, fvg):
+                vigentes.append(fvg)
+            else:
                 ifvg_info = fvg.copy()
                 ifvg_info["tipo"] = "ifvg"
                 ifvg_info["direccion"] = (
                     "compra" if fvg["direccion"] == "venta" else "venta"
                 )
                 ifvg_detectados.append(ifvg_info)
-                self.fvg_memoria.remove(fvg)
-                self.ifvg_memoria.append(ifvg_info)
-                logging.info(f"IFVG detectado: {ifvg_info['timestamp']}")
+                # Solo las primeras MEMORIA_ANTERIORES sobreviven a la
+                # actualización de abajo
+                if len(self.ifvg_memoria) < MEMORIA_ANTERIORES:
+                    self.ifvg_memoria.append(ifvg_info)
+                if registrar:
+                    logger.info("ifvg=detectado ts=%s", ifvg_info["timestamp"])
+        if len(vigentes) < len(self.fvg_memoria):
+            self.fvg_memoria.clear()
+            self.fvg_memoria.extend(vigentes)
 
         analysis_data["fvg_detectados"] = fvg_detectados
         analysis_data["ifvg_detectados"] = ifvg_detectados
 
         # Actualizar memorias
-        self.fvg_memoria = fvg_detectados[:3] + self.fvg_memoria[:5]
-        self.ifvg_memoria = ifvg_detectados[:3] + self.ifvg_memoria[:5]
+        _actualizar_memoria(self.fvg_memoria, fvg_detectados)
+        _actualizar_memoria(self.ifvg_memoria, ifvg_detectados)
 
         # 3. Verificar oportunidades de entrada (FVG, IFVG y CE)
         precio_reciente = {
-            "high": float(reciente["high"]),
-            "low": float(reciente["low"]),
-            "close": float(reciente["close"]),
-            "timestamp": str(reciente.name),
+            "high": r_high,
+            "low": r_low,
+            "close": r_close,
+            "timestamp": str(r_time),
         }
         analysis_data["precio_reciente"] = precio_reciente
 
         # Combinar todas las oportunidades (FVG + IFVG)
-        todas_oportunidades = self.fvg_memoria + self.ifvg_memoria
-
-        for idx, oportunidad in enumerate(todas_oportunidades):
-            # Calcular CE para cada oportunidad
-            ce_level = self._calcular_ce(oportunidad)
-
-            if oportunidad["direccion"] == "compra":
-                # Entrada por mitigación completa
-                if (
-                    reciente["low"] <= oportunidad["fvg_alto"]
-                    and reciente["close"] > oportunidad["fvg_bajo"]
-                ):
-                    analysis_data["entrada_generada"] = True
-                    analysis_data["razon_entrada"] = (
-                        f"FVG mitigado completamente (índice {idx})"
-                    )
-                    logging.info("✅ FVG mitigado. Entrada COMPRA.")
-                    return (
-                        self._crear_señal(reciente, oportunidad, "compra"),
-                        analysis_data,
-                    )
-
-                # Entrada por CE (50%)
-                elif reciente["low"] <= ce_level and reciente["close"] > ce_level:
-                    analysis_data["entrada_generada"] = True
-                    analysis_data["razon_entrada"] = (
-                        f"Entrada en CE (50%) (distancia: {abs(reciente['close'] - ce_level):.5f})"
-                    )
-                    logging.info("⚠️ Entrada COMPRA en CE (50%).")
-                    return (
-                        self._crear_señal(reciente, oportunidad, "compra"),
-                        analysis_data,
-                    )
-
-                # Entrada por proximidad (tolerancia)
-                elif (
-                    abs(reciente["low"] - oportunidad["fvg_alto"])
-                    <= self.TOLERANCIA_MITIGACION
-                ):
-                    analysis_data["entrada_generada"] = True
-                    analysis_data["razon_entrada"] = (
-                        f"Entrada por proximidad (distancia: {abs(reciente['low'] - oportunidad['fvg_alto']):.5f})"
-                    )
-                    logging.info("⚠️ Entrada COMPRA por proximidad.")
-                    return (
-                        self._crear_señal(reciente, oportunidad, "compra"),
-                        analysis_data,
-                    )
-
-            elif oportunidad["direccion"] == "venta":
-                # Entrada por mitigación completa
-                if (
-                    reciente["high"] >= oportunidad["fvg_bajo"]
-                    and reciente["close"] < oportunidad["fvg_alto"]
-                ):
-                    analysis_data["entrada_generada"] = True
-                    analysis_data["razon_entrada"] = (
-                        f"FVG mitigado completamente (índice {idx})"
-                    )
-                    logging.info("✅ FVG mitigado. Entrada VENTA.")
-                    return (
-                        self._crear_señal(reciente, oportunidad, "venta"),
-                        analysis_data,
-                    )
-
-                # Entrada por CE (50%)
-                elif reciente["high"] >= ce_level and reciente["close"] < ce_level:
-                    analysis_data["entrada_generada"] = True
-                    analysis_data["razon_entrada"] = (
-                        f"Entrada en CE (50%) (distancia: {abs(reciente['close'] - ce_level):.5f})"
-                    )
-                    logging.info("⚠️ Entrada VENTA en CE (50%).")
-                    return (
-                        self._crear_señal(reciente, oportunidad, "venta"),
-                        analysis_data,
-                    )
+        todas_oportunidades = [*self.fvg_memoria, *self.ifvg_memoria]
+
+        # Las reglas de entrada se evalúan sobre arreglos con los extremos y
+        # la dirección de cada oportunidad, en el orden de la lista
+        # (sin memoria no hay nada que armar ni evaluar)
+        n_oportunidades = len(todas_oportunidades)
+        if n_oportunidades:
+            altos = np.fromiter(
+                (op["fvg_alto"] for op in todas_oportunidades),
+                np.float64,
+                n_oportunidades,
+            )
+            bajos = np.fromiter(
+                (op["fvg_bajo"] for op in todas_oportunidades),
+                np.float64,
+                n_oportunidades,
+            )
+            compras = np.fromiter(
+                (op["direccion"] == "compra" for op in todas_oportunidades),
+                np.bool_,
+                n_oportunidades,
+            )
+            idx, tipo = _kernels.buscar_entrada(
+                altos,
+                bajos,
+                compras,
+                r_high,
+                r_low,
+                r_close,
+                self.TOLERANCIA_MITIGACION,
+            )
+        else:
+            idx, tipo = -1, _kernels.SIN_ENTRADA
+
+        if tipo != _kernels.SIN_ENTRADA:
+            oportunidad = todas_oportunidades[idx]
+            direccion = "compra" if compras[idx] else "venta"
+            if tipo == _kernels.MITIGACION:
+                razon, etiqueta = (
+                    _Texto("FVG mitigado completamente (índice {})", (idx,)),
+                    "mitigacion",
+                )
+            elif tipo == _kernels.CE:
+                distancia = abs(r_close - self._calcular_ce(oportunidad))
+                razon, etiqueta = (
+                    _Texto("Entrada en CE (50%) (distancia: {:.5f})", (distancia,)),
+                    "ce",
+                )
+            else:
+                if direccion == "compra":
+                    distancia = abs(r_low - oportunidad["fvg_alto"])
+                else:
+                    distancia = abs(r_high - oportunidad["fvg_bajo"])
+                razon, etiqueta = (
+                    _Texto("Entrada por proximidad (distancia: {:.5f})", (distancia,)),
+                    "proximidad",
+                )
 
-                # Entrada por proximidad (tolerancia)
-                elif (
-                    abs(reciente["high"] - oportunidad["fvg_bajo"])
-                    <= self.TOLERANCIA_MITIGACION
-                ):
-                    analysis_data["entrada_generada"] = True
-                    analysis_data["razon_entrada"] = (
-                        f"Entrada por proximidad (distancia: {abs(reciente['high'] - oportunidad['fvg_bajo']):.5f})"
-                    )
-                    logging.info("⚠️ Entrada VENTA por proximidad.")
-                    return (
-                        self._crear_señal(reciente, oportunidad, "venta"),
-                        analysis_data,
-                    )
+            analysis_data["entrada_generada"] = True
+            analysis_data["razon_entrada"] = razon
+            logger.info("entrada=%s razon=%s indice=%d", direccion, etiqueta, idx)
+            return (
+                self._crear_señal(r_close, r_time, oportunidad, direccion),
+                analysis_data,
+            )
 
         analysis_data["razon_entrada"] = "No se encontró FVG/IFVG válido mitigado"
-        logging.info("No se encontró FVG/IFVG válido mitigado ni en CE.")
+        logger.info("entrada=ninguna")
         return None, analysis_data
 
     def _crear_señal(
-        self, reciente: pd.Series, oportunidad: Dict, direccion: str
+        self,
+        precio_entrada: float,
+        timestamp: pd.Timestamp,
+        oportunidad: Dict,
+        direccion: str,
     ) -> Dict:
         """Crea señal de entrada estandarizada"""
         return {
             "direccion": direccion,
-            "precio_entrada": reciente["close"],
+            "precio_entrada": precio_entrada,
             "stop_loss": oportunidad["stop_loss"],
-            "timestamp": reciente.name,
+            "timestamp": timestamp,
             "tipo_oportunidad": oportunidad.get("tipo", "fvg"),
         }
 
-    def _vela_valida(self, vela: pd.Series) -> bool:
-        """Mantiene la validación existente de velas"""
-        rango = vela["high"] - vela["low"]
-        es_valida = rango >= self.RANGO_MINIMO_VELA
-        logging.debug(
-            f"Vela validación -> Rango: {rango:.5f} - {'✅' if es_valida else '❌'}"
-        )
-        return es_valida
-
     def _calcular_niveles_y_lote(self, señal: Dict) -> Dict:
         """Mantiene el cálculo original de niveles y lote"""
-        logging.info("--- 3. Calculando niveles y tamaño de lote ---")
-        sl = abs(señal["precio_entrada"] - señal["stop_loss"])
+        logger.info("paso=3 analisis=niveles_lote")
+        entrada = señal["precio_entrada"]
+        # abs se mantiene: en entradas por proximidad o IFVG el stop puede
+        # quedar del lado contrario al esperado
+        sl = abs(entrada - señal["stop_loss"])
         if sl == 0:
-            logging.error("SL = 0. Cancelando cálculo.")
+            logger.error("SL = 0. Cancelando cálculo.")
             return None
-        tp = (
-            señal["precio_entrada"] + self.RR * sl
-            if señal["direccion"] == "compra"
-            else señal["precio_entrada"] - self.RR * sl
-        )
-        sl_pips = sl * 10000
-        lote = max(
-            0.01,
-            round(
-                (self.CUENTA_INICIAL * self.RIESGO_POR_OPERACION)
-                / (sl_pips * self.VALOR_POR_PIP),
-                2,
-            ),
-        )
+        signo = 1 if señal["direccion"] == "compra" else -1
+        tp = entrada + signo * (self.RR * sl)
+        lote = max(0.01, round(self._lote_coef / sl, 2))
 
         # Agregar información adicional para análisis
         señal.update(
@@ -488,36 +1054,96 @@ class ICTMSSStrategy:
                 "tipo_entrada": señal.get("tipo_oportunidad", "fvg"),
             }
         )
-        logging.info(f"TP: {tp:.5f}, SL: {señal['stop_loss']:.5f}, Lote: {lote}")
+        logger.info("tp=%.5f sl=%.5f lote=%s", tp, señal["stop_loss"], lote)
         return señal
 
     def _guardar_analisis_toml(self, analysis_data: Dict):
         """
         Guarda el análisis completo en un archivo TOML
+
+        El archivo lo escribe el hilo escritor, que recibe los análisis en
+        lotes de FLUSH_EVERY; usar flush() para enviar el lote en curso y
+        esperar a que se terminen de escribir los pendientes.
         """
         self.analysis_counter += 1
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if not self.SAVE_ANALYSIS:
+            return
+
+        # Una sola lectura del reloj por análisis, solo si se guarda
+        iso = datetime.now().isoformat()
+        analysis_data["metadata"]["timestamp"] = iso
+        if "analisis_sesgo" in analysis_data:
+            # Copia: el diccionario del sesgo puede estar en la caché
+            analysis_data["analisis_sesgo"] = {
+                **analysis_data["analisis_sesgo"],
+                "timestamp": iso,
+            }
+        # "%Y%m%d_%H%M%S" recortado del ISO ya calculado (YYYY-MM-DDTHH:MM:SS),
+        # más barato que un strftime por análisis
+        timestamp = (
+            f"{iso[0:4]}{iso[5:7]}{iso[8:10]}_{iso[11:13]}{iso[14:16]}{iso[17:19]}"
+        )
         filename = f"analysis_{self.analysis_counter:04d}_{timestamp}.toml"
         filepath = self.output_dir / filename
 
-        try:
-            with open(filepath, "w", encoding="utf-8") as f:
-                toml.dump(analysis_data, f)
-            logging.info(f"📊 Análisis guardado en: {filepath}")
-        except Exception as e:
-            logging.error(f"Error al guardar análisis: {e}")
+        if self._escritor is None:
+            self._escritor = threading.Thread(
+                target=_escritor_analisis,
+                args=(self._cola_analisis,),
+                name="escritor-analisis",
+                daemon=True,
+            )
+            self._escritor.start()
+            # El hilo es daemon: si no se llamó a close, al salir se envía el
+            # último lote y se espera a que vacíe la cola
+            atexit.register(self.flush)
+        self._lote_analisis.append((filepath, analysis_data))
+        if len(self._lote_analisis) >= self.FLUSH_EVERY:
+            self._enviar_lote()
+
+    def _enviar_lote(self):
+        """Pasa el lote en curso al hilo escritor (un solo put por lote)"""
+        if self._lote_analisis:
+            self._cola_analisis.put((self._lote_analisis, self._estado_reporte))
+            self._lote_analisis = []
+
+    def flush(self):
+        """Envía el lote en curso y espera a que el escritor lo guarde todo"""
+        if self._escritor is not None:
+            self._enviar_lote()
+            self._cola_analisis.join()
+
+    def close(self):
+        """
+        Guarda lo pendiente y detiene el hilo escritor
 
-    def analizar_mercado(
-        self, df_m15: pd.DataFrame, df_m1: pd.DataFrame
-    ) -> Optional[Dict]:
-        logging.info(
-            "================== INICIANDO NUEVO ANÁLISIS DE MERCADO =================="
-        )
+        Llamarla al terminar con la estrategia (p. ej. en un backtest que
+        crea muchas): libera el hilo y el registro en atexit, que mantiene
+        viva la instancia. Si se guarda otro análisis después, el escritor
+        vuelve a arrancar.
+        """
+        if self._escritor is None:
+            return
+        self.flush()
+        self._cola_analisis.put(None)
+        self._escritor.join()
+        self._escritor = None
+        atexit.unregister(self.flush)
+
+    def _iniciar_analisis(self, n_m15: int, n_m1: int) -> Optional[Dict]:
+        """
+        Estructura base del análisis con metadatos y configuración
 
-        # Preparar estructura de datos completa para el análisis
-        analysis_data = {
+        Returns:
+            None si SAVE_ANALYSIS está desactivado (no se arma el registro)
+        """
+        logger.info("analisis=inicio id=%d", self.analysis_counter + 1)
+        if not self.SAVE_ANALYSIS:
+            return None
+
+        return {
             "metadata": {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": None,  # Se completa al guardar el análisis
                 "analysis_id": self.analysis_counter + 1,
                 "version": "1.0",
             },
@@ -533,198 +1159,408 @@ class ICTMSSStrategy:
                 "rango_minimo_vela": self.RANGO_MINIMO_VELA,
             },
             "datos_entrada": {
-                "velas_m15_originales": len(df_m15),
-                "velas_m1_originales": len(df_m1),
+                "velas_m15_originales": n_m15,
+                "velas_m1_originales": n_m1,
             },
         }
 
+    def _filtrar_velas_sesion_ny(
+        self, velas: _Bars, mask: Optional[np.ndarray] = None
+    ) -> _Bars:
+        """
+        Equivalente a _filtrar_sesion_ny sobre arreglos (ts en ns UTC)
+
+        Si se pasa mask (ya calculada para estas velas) no se recalcula.
+        """
+        if not self.USAR_FILTRO_SESION or len(velas.close) == 0:
+            return velas
+        if mask is None:
+            mask = self._mascara_sesion_ny(pd.to_datetime(velas.ts, utc=True))
+        if mask is None or mask.all():
+            return velas
+        filtradas = velas.filtrar(mask)
+        logger.info(
+            "filtro_sesion velas=%d total=%d",
+            len(filtradas.close),
+            len(velas.close),
+        )
+        return filtradas
+
+    def analizar_mercado(
+        self, df_m15: pd.DataFrame, df_m1: pd.DataFrame
+    ) -> Optional[Dict]:
+        # Preparar estructura de datos completa para el análisis
+        analysis_data = self._iniciar_analisis(len(df_m15), len(df_m1))
+
         # Filtrar datos
         df_m15_filtrado = self._filtrar_sesion_ny(df_m15)
         df_m1_filtrado = self._filtrar_sesion_ny(df_m1)
 
-        analysis_data["datos_filtrados"] = {
-            "velas_m15_filtradas": len(df_m15_filtrado),
-            "velas_m1_filtradas": len(df_m1_filtrado),
-            "filtro_aplicado": self.USAR_FILTRO_SESION,
+        # Columnas como arreglos NumPy, extraídas una sola vez por análisis
+        return self._analizar_velas(
+            _Bars.desde_df(df_m15_filtrado, self._dtype_precios),
+            _Bars.desde_df(df_m1_filtrado, self._dtype_precios),
+            analysis_data,
+        )
+
+    def analizar_mercado_np(
+        self,
+        tiempos_m15: np.ndarray,
+        highs_m15: np.ndarray,
+        lows_m15: np.ndarray,
+        closes_m15: np.ndarray,
+        tiempos_m1: np.ndarray,
+        highs_m1: np.ndarray,
+        lows_m1: np.ndarray,
+        closes_m1: np.ndarray,
+    ) -> Optional[Dict]:
+        """
+        Igual que analizar_mercado pero con las velas como arreglos NumPy
+
+        Pensado para backtests que extraen las columnas una sola vez y pasan
+        vistas (slices) en cada paso, sin construir DataFrames.
+
+        Args:
+            tiempos_*: Apertura de cada vela en nanosegundos UTC (int64)
+            highs_*, lows_*, closes_*: Precios de cada vela
+        """
+        dtype = self._dtype_precios
+        velas_m15 = _Bars(
+            tiempos_m15,
+            *(np.asarray(x, dtype=dtype) for x in (highs_m15, lows_m15, closes_m15)),
+        )
+        velas_m1 = _Bars(
+            tiempos_m1,
+            *(np.asarray(x, dtype=dtype) for x in (highs_m1, lows_m1, closes_m1)),
+        )
+        analysis_data = self._iniciar_analisis(len(closes_m15), len(closes_m1))
+
+        return self._analizar_velas(
+            self._filtrar_velas_sesion_ny(velas_m15),
+            self._filtrar_velas_sesion_ny(velas_m1),
+            analysis_data,
+        )
+
+    def analizar_mercado_batch(
+        self,
+        df_m15: pd.DataFrame,
+        df_m1: pd.DataFrame,
+        indices: Optional[np.ndarray] = None,
+    ) -> pd.DataFrame:
+        """
+        Analizar varias velas de M1 de un histórico en una sola llamada
+
+        Para cada posición i de df_m1 el resultado es el mismo que llamar a
+        analizar_mercado con las últimas VELAS_M1 velas de M1 hasta i y las
+        últimas VELAS_M15 velas de M15 ya cerradas al cierre de la vela i (la
+        vela de M15 en formación no entra: sus valores finales todavía no se
+        conocen). Las columnas, la máscara de sesión y los swings de M15 se
+        calculan una vez para todo el histórico; cada paso solo toma vistas
+        de los arreglos. Los swings precalculados se descartan al terminar.
+
+        El análisis tiene estado (memoria de FVG, último sesgo válido), así
+        que los pasos se evalúan en orden y no de forma independiente.
+
+        Args:
+            df_m15, df_m1: Histórico completo de cada temporalidad
+            indices: Posiciones de df_m1 a analizar (por defecto todas las
+                que tienen VELAS_M1 velas previas)
+
+        Returns:
+            DataFrame con una fila por señal generada y la columna
+            "indice" con la posición de df_m1
+        """
+        velas_m15, mask_m15 = self._velas_historico(df_m15)
+        velas_m1, mask_m1 = self._velas_historico(df_m1)
+
+        if indices is None:
+            indices = range(self.MIN_VELAS_M1 - 1, len(velas_m1.ts))
+        # Velas de M15 que ya cerraron cuando cierra cada vela de M1 pedida
+        cierres_m1 = velas_m1.ts[np.asarray(indices, dtype=np.int64)] + _NS_M1
+        finales_m15 = np.searchsorted(velas_m15.ts + _NS_M15, cierres_m1, "right")
+
+        # Los swings del histórico solo valen para esta llamada: no se deja
+        # en la instancia una referencia a todo el histórico
+        self.precalcular_swings(df_m15)
+        try:
+            return self._recorrer_historico(
+                velas_m15, mask_m15, velas_m1, mask_m1, indices, finales_m15
+            )
+        finally:
+            self._swings_previos = None
+
+    def _recorrer_historico(
+        self,
+        velas_m15: _Bars,
+        mask_m15: Optional[np.ndarray],
+        velas_m1: _Bars,
+        mask_m1: Optional[np.ndarray],
+        indices,
+        finales_m15: np.ndarray,
+    ) -> pd.DataFrame:
+        """Pasos de analizar_mercado_batch, en orden"""
+        n15, n1 = self.MIN_VELAS_M15, self.MIN_VELAS_M1
+        señales = []
+        for i, fin_15 in zip(np.asarray(indices).tolist(), finales_m15.tolist()):
+            ini_1, fin_1 = max(0, i - n1 + 1), i + 1
+            ini_15 = max(0, fin_15 - n15)
+            ventana_m15 = velas_m15.ventana(ini_15, fin_15)
+            ventana_m1 = velas_m1.ventana(ini_1, fin_1)
+            analysis_data = self._iniciar_analisis(
+                len(ventana_m15.ts), len(ventana_m1.ts)
+            )
+            if mask_m15 is not None:
+                ventana_m15 = self._filtrar_velas_sesion_ny(
+                    ventana_m15, mask_m15[ini_15:fin_15]
+                )
+            if mask_m1 is not None:
+                ventana_m1 = self._filtrar_velas_sesion_ny(
+                    ventana_m1, mask_m1[ini_1:fin_1]
+                )
+            señal = self._analizar_velas(ventana_m15, ventana_m1, analysis_data)
+            if señal:
+                señales.append({"indice": i, **señal})
+
+        return pd.DataFrame(señales)
+
+    def _velas_historico(self, df: pd.DataFrame) -> Tuple[_Bars, Optional[np.ndarray]]:
+        """
+        Velas de un histórico y su máscara de sesión (None si no se filtra)
+
+        Con máscara, el índice naive se localiza en UTC igual que en
+        _filtrar_sesion_ny para que las fechas de las señales coincidan.
+        """
+        velas = _Bars.desde_df(df, self._dtype_precios)
+        if not self.USAR_FILTRO_SESION or len(velas.ts) == 0:
+            return velas, None
+        index = velas.index
+        if index.tz is None:
+            index = index.tz_localize("UTC")
+        mask = self._mascara_sesion_ny(index)
+        if mask is None:
+            return velas, None
+        return velas._replace(index=index), mask
+
+    def _resumen_señal(self, señal: Dict) -> Dict:
+        """Resultado del análisis cuando se generó una señal"""
+        return {
+            "señal_generada": True,
+            "señal": {
+                "direccion": señal["direccion"],
+                "precio_entrada": señal["precio_entrada"],
+                "stop_loss": señal["stop_loss"],
+                "take_profit": señal["take_profit"],
+                "tamaño_lote": señal["tamaño_lote"],
+                "distancia_sl": señal["distancia_sl"],
+                "rr_ratio": señal["rr_ratio"],
+                "timestamp": str(señal["timestamp"]),
+            },
         }
 
-        if df_m15_filtrado.empty or df_m1_filtrado.empty:
-            analysis_data["resultado"] = {
-                "señal_generada": False,
-                "razon": "Datos insuficientes tras el filtro",
+    def _cerrar_analisis(
+        self, analysis_data: Optional[Dict], resultado: Optional[Dict]
+    ):
+        """Agrega el resultado y guarda el análisis (si se está registrando)"""
+        if analysis_data is None:
+            self.analysis_counter += 1
+            return
+        analysis_data["resultado"] = resultado
+        self._guardar_analisis_toml(analysis_data)
+
+    def _analizar_velas(
+        self, velas_m15: _Bars, velas_m1: _Bars, analysis_data: Optional[Dict]
+    ) -> Optional[Dict]:
+        """
+        Sesgo, búsqueda de entrada y niveles sobre velas ya filtradas
+
+        Con analysis_data None (SAVE_ANALYSIS desactivado) no se arma el
+        registro del análisis, solo se calcula la señal.
+        """
+        guardar = analysis_data is not None
+        n_m15, n_m1 = len(velas_m15.close), len(velas_m1.close)
+        if guardar:
+            analysis_data["datos_filtrados"] = {
+                "velas_m15_filtradas": n_m15,
+                "velas_m1_filtradas": n_m1,
+                "filtro_aplicado": self.USAR_FILTRO_SESION,
             }
-            self._guardar_analisis_toml(analysis_data)
-            logging.info("Datos insuficientes tras el filtro.")
+
+        if n_m15 == 0 or n_m1 == 0:
+            self._cerrar_analisis(
+                analysis_data,
+                {
+                    "señal_generada": False,
+                    "razon": "Datos insuficientes tras el filtro",
+                },
+            )
+            logger.info("senal=no razon=datos_insuficientes")
             return None
 
         # Determinar sesgo
         sesgo, nivel_referencia, sesgo_analysis = self._determinar_sesgo_m15(
-            df_m15_filtrado
+            None, velas_m15
         )
-        analysis_data["analisis_sesgo"] = sesgo_analysis
+        if guardar:
+            analysis_data["analisis_sesgo"] = sesgo_analysis
 
         if not sesgo:
-            analysis_data["resultado"] = {
-                "señal_generada": False,
-                "razon": "Sesgo no determinado",
-            }
-            self._guardar_analisis_toml(analysis_data)
-            logging.info("Sesgo no determinado. Análisis detenido.")
+            self._cerrar_analisis(
+                analysis_data,
+                {"señal_generada": False, "razon": "Sesgo no determinado"},
+            )
+            logger.info("senal=no razon=sin_sesgo")
             return None
 
         # Buscar FVG y entrada
-        señal, fvg_analysis = self._buscar_fvg_y_entrada_m1(df_m1_filtrado, sesgo)
-        analysis_data["analisis_fvg"] = fvg_analysis
+        señal, fvg_analysis = self._buscar_fvg_y_entrada_m1(None, sesgo, velas_m1)
+        if guardar:
+            analysis_data["analisis_fvg"] = fvg_analysis
 
         if señal:
             # Calcular niveles
             señal_completa = self._calcular_niveles_y_lote(señal)
             if señal_completa:
-                analysis_data["resultado"] = {
-                    "señal_generada": True,
-                    "señal": {
-                        "direccion": señal_completa["direccion"],
-                        "precio_entrada": float(señal_completa["precio_entrada"]),
-                        "stop_loss": float(señal_completa["stop_loss"]),
-                        "take_profit": float(señal_completa["take_profit"]),
-                        "tamaño_lote": float(señal_completa["tamaño_lote"]),
-                        "distancia_sl": float(señal_completa["distancia_sl"]),
-                        "rr_ratio": señal_completa["rr_ratio"],
-                        "timestamp": str(señal_completa["timestamp"]),
-                    },
-                }
-                self._guardar_analisis_toml(analysis_data)
+                self._cerrar_analisis(
+                    analysis_data,
+                    self._resumen_señal(señal_completa) if guardar else None,
+                )
                 return señal_completa
 
-        analysis_data["resultado"] = {
-            "señal_generada": False,
-            "razon": "No se generó señal de entrada válida",
-        }
-        self._guardar_analisis_toml(analysis_data)
-        logging.info("No se generó señal de entrada válida.")
+        self._cerrar_analisis(
+            analysis_data,
+            {"señal_generada": False, "razon": "No se generó señal de entrada válida"},
+        )
+        logger.info("senal=no razon=sin_entrada")
         return None
 
     def simular_operacion(self, señal: Dict, df_futuro: pd.DataFrame) -> Dict:
         """Mantiene la simulación original pero registra el tipo de oportunidad"""
-        resultado = {
-            "resultado": "pendiente",
-            "precio_salida": None,
-            "pips": 0,
-            "tipo_oportunidad": señal.get("tipo_oportunidad", "fvg"),
-        }
+        es_compra = señal["direccion"] == "compra"
+        dtype = self._dtype_precios or np.float64
+        # SL y TP en el dtype de los precios: con PRECIOS_FLOAT32 el kernel
+        # compilado y el de NumPy comparan en float32 por igual
+        precio = np.dtype(dtype).type
+        codigo = _kernels.simular_salida(
+            df_futuro["low"].to_numpy(dtype=dtype),
+            df_futuro["high"].to_numpy(dtype=dtype),
+            precio(señal["stop_loss"]),
+            precio(señal["take_profit"]),
+            es_compra,
+        )
 
-        for _, row in df_futuro.iterrows():
-            if señal["direccion"] == "compra":
-                if row["low"] <= señal["stop_loss"]:
-                    resultado = {
-                        "resultado": "perdida",
-                        "precio_salida": señal["stop_loss"],
-                        "pips": (señal["stop_loss"] - señal["precio_entrada"]) * 10000,
-                        "tipo_oportunidad": señal.get("tipo_oportunidad", "fvg"),
-                    }
-                    break
-                elif row["high"] >= señal["take_profit"]:
-                    resultado = {
-                        "resultado": "ganancia",
-                        "precio_salida": señal["take_profit"],
-                        "pips": (señal["take_profit"] - señal["precio_entrada"])
-                        * 10000,
-                        "tipo_oportunidad": señal.get("tipo_oportunidad", "fvg"),
-                    }
-                    break
+        # El resultado se arma una sola vez, ya decidido el desenlace
+        if codigo == _kernels.PENDIENTE:
+            estado, precio_salida, pips = "pendiente", None, 0
+        else:
+            if codigo == _kernels.PERDIDA:
+                estado, precio_salida = "perdida", señal["stop_loss"]
             else:
-                if row["high"] >= señal["stop_loss"]:
-                    resultado = {
-                        "resultado": "perdida",
-                        "precio_salida": señal["stop_loss"],
-                        "pips": (señal["precio_entrada"] - señal["stop_loss"]) * 10000,
-                        "tipo_oportunidad": señal.get("tipo_oportunidad", "fvg"),
-                    }
-                    break
-                elif row["low"] <= señal["take_profit"]:
-                    resultado = {
-                        "resultado": "ganancia",
-                        "precio_salida": señal["take_profit"],
-                        "pips": (señal["precio_entrada"] - señal["take_profit"])
-                        * 10000,
-                        "tipo_oportunidad": señal.get("tipo_oportunidad", "fvg"),
-                    }
-                    break
-        return resultado
+                estado, precio_salida = "ganancia", señal["take_profit"]
+            signo = 1 if es_compra else -1
+            pips = signo * (precio_salida - señal["precio_entrada"]) * 10000
+        return {
+            "resultado": estado,
+            "precio_salida": precio_salida,
+            "pips": pips,
+            "tipo_oportunidad": señal.get("tipo_oportunidad", "fvg"),
+        }
 
     def registrar_operacion(self, operacion: Dict):
-        """Registra operaciones con información adicional"""
-        operacion_completa = operacion.copy()
-        operacion_completa["tipo_entrada"] = operacion.get("tipo_entrada", "fvg")
-        logging.info(f"Registrando operación: {operacion_completa}")
-        self.operaciones.append(
-            {"timestamp": datetime.now(), "operacion": operacion_completa}
-        )
+        """
+        Registra operaciones con información adicional
+
+        El diccionario no se copia ni se modifica, así que el llamador no
+        debe modificarlo después. Se guarda como (timestamp_ns, operacion)
+        usando la vela de la señal, o el reloj si la operación no la trae.
+        """
+        logger.info("Registrando operación: %s", operacion)
+        ts = operacion.get("timestamp")
+        ts_ns = ts.value if isinstance(ts, pd.Timestamp) else time_ns()
+        # Primero los acumuladores: si la operación no es válida (falta
+        # distancia_sl) falla sin quedar guardada ni contada
+        self._acumular_operacion(operacion)
+        self._operaciones.append((ts_ns, operacion))
+
+    @property
+    def operaciones(self) -> List[Dict]:
+        """
+        Operaciones registradas como {"timestamp", "operacion"}
+
+        Se construye al pedirla: timestamp es un datetime UTC y operacion
+        incluye tipo_entrada ("fvg" si no se indicó)
+        """
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(ts_ns / 10**9, timezone.utc),
+                "operacion": (
+                    op if "tipo_entrada" in op else {**op, "tipo_entrada": "fvg"}
+                ),
+            }
+            for ts_ns, op in self._operaciones
+        ]
+
+    def _acumular_operacion(self, op: Dict):
+        """
+        Suma la operación a los acumuladores por tipo de entrada
+
+        Los campos se leen antes de tocar los acumuladores: si falta alguno
+        se lanza la excepción sin haber sumado nada
+        """
+        acum = self._acumulado
+        resultado = op.get("resultado")
+        tipo = op.get("tipo_entrada", "fvg")
+        es_ce = "CE" in (op.get("razon_entrada") or "")
+        if resultado in ("ganancia", "perdida"):
+            perdida = float(op["distancia_sl"])
+            ganancia = perdida * self.RR
+
+        if tipo == "fvg":
+            acum["operaciones_fvg"] += 1
+        elif tipo == "ifvg":
+            acum["operaciones_ifvg"] += 1
+        if es_ce:
+            acum["operaciones_ce"] += 1
+
+        if resultado == "ganancia":
+            acum["ganadas"] += 1
+            if tipo == "fvg":
+                acum["ganancia_fvg"] += ganancia
+            elif tipo == "ifvg":
+                acum["ganancia_ifvg"] += ganancia
+            if es_ce:
+                acum["ganancia_ce"] += ganancia
+        elif resultado == "perdida":
+            if tipo == "fvg":
+                acum["perdida_fvg"] += perdida
+            elif tipo == "ifvg":
+                acum["perdida_ifvg"] += perdida
+            if es_ce:
+                acum["perdida_ce"] += perdida
 
     def obtener_estadisticas(self) -> Dict:
         """Proporciona estadísticas diferenciadas por tipo de entrada"""
-        if not self.operaciones:
-            logging.info("Sin operaciones registradas.")
+        if not self._operaciones:
+            logger.info("Sin operaciones registradas.")
             return {"total_operaciones": 0}
 
-        total = len(self.operaciones)
-        ganadas = sum(
-            1
-            for op in self.operaciones
-            if op["operacion"].get("resultado") == "ganancia"
-        )
+        # Los totales se acumulan en registrar_operacion: O(1) por llamada
+        acum = self._acumulado
+        total = len(self._operaciones)
+        ganadas = acum["ganadas"]
         perdidas = total - ganadas
         win_rate = (ganadas / total) * 100
 
-        # Calcular ganancias y pérdidas por tipo de entrada
-        ganancia_fvg = sum(
-            op["operacion"]["distancia_sl"] * self.RR
-            for op in self.operaciones
-            if op["operacion"].get("resultado") == "ganancia"
-            and op["operacion"].get("tipo_entrada", "fvg") == "fvg"
-        )
-
-        perdida_fvg = sum(
-            op["operacion"]["distancia_sl"]
-            for op in self.operaciones
-            if op["operacion"].get("resultado") == "perdida"
-            and op["operacion"].get("tipo_entrada", "fvg") == "fvg"
-        )
-
-        ganancia_ifvg = sum(
-            op["operacion"]["distancia_sl"] * self.RR
-            for op in self.operaciones
-            if op["operacion"].get("resultado") == "ganancia"
-            and op["operacion"].get("tipo_entrada") == "ifvg"
-        )
-
-        perdida_ifvg = sum(
-            op["operacion"]["distancia_sl"]
-            for op in self.operaciones
-            if op["operacion"].get("resultado") == "perdida"
-            and op["operacion"].get("tipo_entrada") == "ifvg"
-        )
-
-        ganancia_ce = sum(
-            op["operacion"]["distancia_sl"] * self.RR
-            for op in self.operaciones
-            if op["operacion"].get("resultado") == "ganancia"
-            and "CE" in op["operacion"].get("razon_entrada", "")
-        )
-
-        perdida_ce = sum(
-            op["operacion"]["distancia_sl"]
-            for op in self.operaciones
-            if op["operacion"].get("resultado") == "perdida"
-            and "CE" in op["operacion"].get("razon_entrada", "")
+        ganancia_total = (
+            acum["ganancia_fvg"] + acum["ganancia_ifvg"] + acum["ganancia_ce"]
         )
-
-        ganancia_total = ganancia_fvg + ganancia_ifvg + ganancia_ce
-        perdida_total = perdida_fvg + perdida_ifvg + perdida_ce
-        pf = ganancia_total / perdida_total if perdida_total > 0 else float("inf")
-
-        logging.info(
-            f"Estadísticas → Total: {total}, Win Rate: {win_rate:.2f}%, Profit Factor: {pf:.2f}"
+        perdida_total = acum["perdida_fvg"] + acum["perdida_ifvg"] + acum["perdida_ce"]
+        pf = ganancia_total / perdida_total if perdida_total > 0 else np.inf
+
+        logger.info(
+            "Estadísticas → Total: %d, Win Rate: %.2f%%, Profit Factor: %.2f",
+            total,
+            win_rate,
+            pf,
         )
 
         return {
@@ -733,102 +1569,133 @@ class ICTMSSStrategy:
             "perdidas": perdidas,
             "win_rate": win_rate,
             "profit_factor": pf,
-            "operaciones_fvg": sum(
-                1
-                for op in self.operaciones
-                if op["operacion"].get("tipo_entrada") == "fvg"
-            ),
-            "operaciones_ifvg": sum(
-                1
-                for op in self.operaciones
-                if op["operacion"].get("tipo_entrada") == "ifvg"
-            ),
-            "operaciones_ce": sum(
-                1
-                for op in self.operaciones
-                if "CE" in op["operacion"].get("razon_entrada", "")
-            ),
+            "operaciones_fvg": acum["operaciones_fvg"],
+            "operaciones_ifvg": acum["operaciones_ifvg"],
+            "operaciones_ce": acum["operaciones_ce"],
         }
 
+    def _cargar_estado_reporte(self):
+        """Retomar los totales del reporte guardados por otra ejecución"""
+        if not self._estado_path.exists():
+            return
+        try:
+            with open(self._estado_path, "rb") as f:
+                self._estado_reporte.cargar(tomllib.load(f))
+            logger.info(
+                "Estado del reporte cargado: %d análisis ya contados",
+                len(self._estado_reporte.procesados),
+            )
+        except Exception as e:
+            # Sin estado válido el próximo reporte vuelve a leer los archivos
+            logger.error("Error al cargar estado del reporte: %s", e)
+            self._estado_reporte.reiniciar()
+
+    def _leer_resumenes(self, nombres: set) -> Dict[str, Dict]:
+        """Resúmenes del JSONL para los archivos pedidos (el último gana)"""
+        ruta = self.output_dir / RESUMENES_JSONL
+        resumenes = {}
+        if not nombres or not ruta.exists():
+            return resumenes
+        try:
+            with open(ruta, "rb") as f:
+                for linea in f:
+                    try:
+                        resumen = json.loads(linea)
+                    except ValueError:
+                        continue  # Línea incompleta: se lee su TOML
+                    nombre = resumen.pop("archivo", None)
+                    if nombre in nombres:
+                        resumenes[nombre] = resumen
+        except Exception as e:
+            logger.error("Error leyendo %s: %s", ruta, e)
+        return resumenes
+
+    def _clave_reporte(self) -> Tuple:
+        """
+        Clave que cambia cuando puede cambiar el reporte
+
+        Crear, borrar o renombrar archivos cambia el mtime del directorio;
+        los análisis de esta instancia además cambian el estado acumulado
+        (también si sobrescriben un archivo ya contado)
+        """
+        estado = self._estado_reporte
+        return (
+            os.stat(self.output_dir).st_mtime_ns,
+            len(estado.procesados),
+            estado.desactualizado,
+        )
+
     def generar_reporte_analisis(self) -> Dict:
         """
         Genera un reporte consolidado de todos los análisis almacenados
+
+        Si desde el último reporte no cambió nada se devuelve el mismo, sin
+        recorrer el directorio ni volver a escribir los archivos
         """
+        self.flush()
         if not os.path.exists(self.output_dir):
             return {"error": "Directorio de análisis no encontrado"}
 
-        archivos_toml = list(self.output_dir.glob("analysis_*.toml"))
+        if self._reporte_cache and self._reporte_cache[0] == self._clave_reporte():
+            # Copia: si el llamador modifica el reporte, la caché no cambia
+            return copy.deepcopy(self._reporte_cache[1])
+
+        # os.scandir ya trae el nombre de cada entrada: no se crea un Path
+        # por archivo como con glob. Nombre -> ruta (str) para abrirlo
+        with os.scandir(self.output_dir) as entradas:
+            archivos_toml = {
+                e.name: e.path
+                for e in entradas
+                if e.name.startswith("analysis_") and e.name.endswith(".toml")
+            }
         if not archivos_toml:
             return {"error": "No se encontraron archivos de análisis"}
 
-        reporte = {
-            "total_analisis": len(archivos_toml),
-            "señales_generadas": 0,
-            "señales_rechazadas": 0,
-            "razones_rechazo": {},
-            "sesgos_detectados": {"alcista": 0, "bajista": 0, "indefinido": 0},
-            "tipos_entrada": {},
-            "estadisticas_fvg": {"total_detectados": 0, "promedio_por_analisis": 0},
-        }
-
-        total_fvg = 0
-        for archivo in archivos_toml:
+        # Los análisis escritos por esta instancia ya están sumados; solo se
+        # leen los archivos que todavía no se contaron (de otra ejecución o
+        # con error al leerlos). Si desapareció o se sobrescribió alguno ya
+        # contado se rehace
+        estado = self._estado_reporte
+        if estado.desactualizado or not estado.procesados <= archivos_toml.keys():
+            estado.reiniciar()
+
+        pendientes = archivos_toml.keys() - estado.procesados
+        resumenes = self._leer_resumenes(pendientes)
+        for nombre in pendientes:
+            if nombre in resumenes:
+                estado.agregar(nombre, {"resumen": resumenes[nombre]})
+                continue
+            archivo = archivos_toml[nombre]
+            # Sin resumen (archivos anteriores al JSONL) se lee el TOML
             try:
-                with open(archivo, "r", encoding="utf-8") as f:
-                    data = toml.load(f)
-
-                # Analizar resultado
-                if data.get("resultado", {}).get("señal_generada", False):
-                    reporte["señales_generadas"] += 1
-                else:
-                    reporte["señales_rechazadas"] += 1
-                    razon = data.get("resultado", {}).get("razon", "Sin razón")
-                    reporte["razones_rechazo"][razon] = (
-                        reporte["razones_rechazo"].get(razon, 0) + 1
-                    )
-
-                # Analizar sesgo
-                sesgo = data.get("analisis_sesgo", {}).get("sesgo_determinado")
-                if sesgo in ["alcista", "bajista"]:
-                    reporte["sesgos_detectados"][sesgo] += 1
-                else:
-                    reporte["sesgos_detectados"]["indefinido"] += 1
-
-                # Analizar FVG
-                fvg_detectados = len(
-                    data.get("analisis_fvg", {}).get("fvg_detectados", [])
-                )
-                total_fvg += fvg_detectados
-
-                # Analizar tipo de entrada
-                razon_entrada = data.get("analisis_fvg", {}).get("razon_entrada")
-                if razon_entrada and "mitigado" in razon_entrada:
-                    tipo = (
-                        "mitigacion_completa"
-                        if "completamente" in razon_entrada
-                        else "mitigacion_proximidad"
-                    )
-                    reporte["tipos_entrada"][tipo] = (
-                        reporte["tipos_entrada"].get(tipo, 0) + 1
-                    )
-
+                # tomllib (biblioteca estándar) lee bastante más rápido que toml
+                with open(archivo, "rb") as f:
+                    data = tomllib.load(f)
+                estado.agregar(nombre, data)
             except Exception as e:
-                logging.error(f"Error procesando {archivo}: {e}")
+                logger.error("Error procesando %s: %s", archivo, e)
 
-        reporte["estadisticas_fvg"]["total_detectados"] = total_fvg
-        reporte["estadisticas_fvg"]["promedio_por_analisis"] = (
-            total_fvg / len(archivos_toml) if archivos_toml else 0
-        )
+        reporte = estado.reporte(len(archivos_toml))
 
         # Guardar reporte
         reporte_path = self.output_dir / "reporte_consolidado.toml"
         reporte["generado_en"] = datetime.now().isoformat()
 
         try:
-            with open(reporte_path, "w", encoding="utf-8") as f:
-                toml.dump(reporte, f)
-            logging.info(f"📈 Reporte consolidado guardado en: {reporte_path}")
+            with open(reporte_path, "wb") as f:
+                tomli_w.dump(reporte, f)
+            logger.info("📈 Reporte consolidado guardado en: %s", reporte_path)
+        except Exception as e:
+            logger.error("Error al guardar reporte consolidado: %s", e)
+
+        # Estado para que la próxima ejecución solo lea los archivos nuevos
+        try:
+            with open(self._estado_path, "wb") as f:
+                tomli_w.dump(estado.como_dict(), f)
         except Exception as e:
-            logging.error(f"Error al guardar reporte consolidado: {e}")
+            logger.error("Error al guardar estado del reporte: %s", e)
 
+        # La clave se toma después de escribir: el reporte y el estado
+        # están en el mismo directorio
+        self._reporte_cache = (self._clave_reporte(), copy.deepcopy(reporte))
         return reporte
@@ -0,0 +1,105 @@
+# conftest.py
+"""
+Configuración común de las pruebas
+
+data_feed importa MetaTrader5 al cargarse y el paquete solo existe para
+Windows. Si no está instalado se registra un módulo con las constantes de
+timeframe para poder importar data_feed; las pruebas que descargan velas
+reemplazan mt5 por el terminal simulado de mt5_simulado.
+"""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+try:
+    import MetaTrader5  # noqa: F401
+except ImportError:
+    _mt5 = types.ModuleType("MetaTrader5")
+    _mt5.TIMEFRAME_M1 = 1
+    _mt5.TIMEFRAME_M5 = 5
+    _mt5.TIMEFRAME_M15 = 15
+    _mt5.TIMEFRAME_M30 = 30
+    _mt5.TIMEFRAME_H1 = 16385
+    _mt5.TIMEFRAME_H4 = 16388
+    _mt5.TIMEFRAME_D1 = 16408
+    sys.modules["MetaTrader5"] = _mt5
+
+from noddle_trader import data_feed  # noqa: E402
+
+# Arreglo estructurado con los campos que devuelve copy_rates_*
+RATES_DTYPE = np.dtype(
+    [
+        ("time", "<i8"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("tick_volume", "<u8"),
+        ("spread", "<i4"),
+        ("real_volume", "<u8"),
+    ]
+)
+
+
+class TerminalSimulado:
+    """
+    Terminal de MT5 con velas deterministas y reloj controlable
+
+    Cada vela depende solo de su tiempo de apertura, salvo la vela en
+    formación, cuyo cierre (y máximo/mínimo) avanza con el reloj: así se
+    comprueba que el buffer incremental reemplaza la vela en curso.
+    """
+
+    def __init__(self, ahora: int = 1_700_000_000):
+        self.ahora = ahora
+        self.llamadas = []
+        for nombre, valor in data_feed.MT5DataFeed.timeframes.items():
+            setattr(self, f"TIMEFRAME_{nombre}", valor)
+        self._segundos = {
+            valor: data_feed._TF_SECONDS[nombre]
+            for nombre, valor in data_feed.MT5DataFeed.timeframes.items()
+        }
+
+    def initialize(self):
+        return True
+
+    def shutdown(self):
+        pass
+
+    def account_info(self):
+        return types.SimpleNamespace(login=1, server="simulado", balance=1000.0)
+
+    def terminal_info(self):
+        return types.SimpleNamespace()
+
+    def last_error(self):
+        return (1, "Success")
+
+    def _vela(self, segundos: int, t: int) -> tuple:
+        rng = np.random.default_rng(t * 31 + segundos)
+        apertura = 1.1 + 0.01 * np.sin(t / 50_000)
+        cierre = apertura + rng.normal(0, 3e-4)
+        if t + segundos > self.ahora:
+            # Vela en formación: el cierre depende del momento de la consulta
+            cierre += (self.ahora - t) * 1e-7
+        alto = max(apertura, cierre) + abs(rng.normal(0, 2e-4))
+        bajo = min(apertura, cierre) - abs(rng.normal(0, 2e-4))
+        return (t, apertura, alto, bajo, cierre, int(rng.integers(1, 100)), 1, 0)
+
+    def copy_rates_from_pos(self, symbol, timeframe, pos, count):
+        self.llamadas.append((timeframe, pos, count))
+        segundos = self._segundos[timeframe]
+        ultima = self.ahora // segundos * segundos - pos * segundos
+        tiempos = range(ultima - (count - 1) * segundos, ultima + 1, segundos)
+        return np.array([self._vela(segundos, t) for t in tiempos], dtype=RATES_DTYPE)
+
+
+@pytest.fixture
+def mt5_simulado(monkeypatch):
+    """Terminal simulado en lugar de MetaTrader5 dentro de data_feed"""
+    terminal = TerminalSimulado()
+    monkeypatch.setattr(data_feed, "mt5", terminal)
+    return terminal
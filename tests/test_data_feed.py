@@ -0,0 +1,140 @@
+# test_data_feed.py
+"""Velas de MT5 como arreglos NumPy, buffer circular y caché de velas"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from noddle_trader import _bar_cache, data_feed
+
+from .conftest import RATES_DTYPE
+
+
+@pytest.fixture
+def feed(mt5_simulado):
+    return data_feed.MT5DataFeed()
+
+
+def test_barras_y_dataframe(feed, mt5_simulado):
+    barras = feed.obtener_barras("EURUSD", "M15", 50)
+    rates = mt5_simulado.copy_rates_from_pos(
+        "EURUSD", data_feed.mt5.TIMEFRAME_M15, 0, 50
+    )
+    assert len(barras) == 50
+    np.testing.assert_array_equal(barras.rates, rates)
+    np.testing.assert_array_equal(barras.hl2, (rates["high"] + rates["low"]) / 2)
+
+    df = barras.to_pandas()
+    assert df.index.tz is not None and df.index.name == "time"
+    assert df.index[-1] == pd.Timestamp(int(rates["time"][-1]), unit="s", tz="UTC")
+    np.testing.assert_allclose(
+        df["ohlc4"], (rates["open"] + rates["high"] + rates["low"] + rates["close"]) / 4
+    )
+    # El DataFrame es una copia: la próxima descarga reutiliza los buffers
+    feed.obtener_barras("EURUSD", "M15", 50)
+    df_otra = feed.obtener_datos_por_velas("EURUSD", "M15", 50)
+    pd.testing.assert_frame_equal(df, df_otra)
+
+
+def _rates(inicio: int, n: int) -> np.ndarray:
+    rates = np.zeros(n, dtype=RATES_DTYPE)
+    rates["time"] = np.arange(inicio, inicio + n) * 60
+    rates["close"] = np.arange(inicio, inicio + n)
+    return rates
+
+
+@pytest.mark.parametrize("bloque", [1, 3, 7, 10, 25])
+def test_ring_conserva_las_ultimas_velas(bloque):
+    capacidad = 10
+    ring = data_feed._RatesRing(capacidad, RATES_DTYPE)
+    todas = _rates(0, 60)
+    for inicio in range(0, len(todas), bloque):
+        ring.agregar(todas[inicio : inicio + bloque])
+        vistas = todas[: inicio + bloque]
+        for n in (1, 4, capacidad):
+            esperado = vistas[-min(n, len(vistas)) :]
+            np.testing.assert_array_equal(ring.latest_view(n), esperado)
+        assert ring.ultimo_time() == vistas["time"][-1]
+
+
+def test_ring_actualizar_ultima():
+    ring = data_feed._RatesRing(4, RATES_DTYPE)
+    ring.agregar(_rates(0, 6))
+    vela = _rates(5, 1)[0].copy()
+    vela["close"] = -1.0
+    ring.actualizar_ultima(vela)
+    assert ring.latest_view(4)["close"].tolist() == [2.0, 3.0, 4.0, -1.0]
+
+
+@pytest.mark.parametrize(
+    "pasos",
+    [
+        [1, 5, 30, 59, 60, 61],  # Dentro de la misma vela y velas nuevas
+        [120, 180, 600, 3600],  # Huecos mayores que la descarga incremental
+        [7, 900, 13, 86_400, 45],  # Mezcla, incluido un día sin consultar
+    ],
+)
+def test_incremental_igual_a_descarga_completa(feed, mt5_simulado, pasos):
+    for paso in [0, *pasos]:
+        mt5_simulado.ahora += paso
+        for timeframe, n in (("M1", 7), ("M15", 20), ("M1", 100)):
+            completo = feed.obtener_datos_por_velas("EURUSD", timeframe, n)
+            incremental = feed.obtener_datos_incrementales("EURUSD", timeframe, n)
+            pd.testing.assert_frame_equal(incremental, completo)
+
+
+def test_incremental_descarga_solo_las_ultimas_velas(feed, mt5_simulado):
+    feed.obtener_datos_incrementales("EURUSD", "M1", 100)
+    mt5_simulado.ahora += 60
+    mt5_simulado.llamadas.clear()
+    feed.obtener_datos_incrementales("EURUSD", "M1", 100)
+    assert mt5_simulado.llamadas == [
+        (data_feed.mt5.TIMEFRAME_M1, 0, feed.velas_incrementales)
+    ]
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    """Caché de velas vacía y con el directorio en tmp_path"""
+    monkeypatch.setattr(_bar_cache, "_memoria", OrderedDict())
+    monkeypatch.setattr(_bar_cache, "CACHE_DIR", tmp_path)
+    return _bar_cache
+
+
+def _df_velas(n: int) -> pd.DataFrame:
+    idx = pd.date_range("2024-01-02", periods=n, freq="1min", tz="UTC", name="time")
+    return pd.DataFrame({"open": 1.0, "close": np.arange(n, dtype=float)}, index=idx)
+
+
+def test_bar_cache_devuelve_copias(cache):
+    key = ("EURUSD", "M1", 0, 60)
+    assert cache.get(key) is None
+    df = _df_velas(5)
+    cache.put(key, df)
+    df.iloc[0, 0] = -1.0  # Modificar el original no cambia lo guardado
+    leido = cache.get(key)
+    pd.testing.assert_frame_equal(leido, _df_velas(5))
+    leido.iloc[0, 0] = -1.0
+    pd.testing.assert_frame_equal(cache.get(key), _df_velas(5))
+
+
+def test_bar_cache_descarta_la_menos_usada(cache, monkeypatch):
+    monkeypatch.setattr(cache, "MAX_EN_MEMORIA", 2)
+    monkeypatch.setattr(cache, "pq", None)  # Solo memoria
+    a, b, c = (("EURUSD", "M1", i, i + 60) for i in range(3))
+    cache.put(a, _df_velas(1))
+    cache.put(b, _df_velas(2))
+    assert cache.get(a) is not None  # a pasa a ser la más reciente
+    cache.put(c, _df_velas(3))
+    assert cache.get(b) is None
+    assert cache.get(a) is not None and cache.get(c) is not None
+
+
+def test_bar_cache_en_disco(cache):
+    pytest.importorskip("pyarrow")
+    key = ("EURUSD", "M15", 0, 900)
+    cache.put(key, _df_velas(4))
+    cache._memoria.clear()
+    pd.testing.assert_frame_equal(cache.get(key), _df_velas(4), check_freq=False)
@@ -0,0 +1,48 @@
+# test_estadisticas.py
+"""Operaciones registradas y estadísticas acumuladas"""
+
+import pytest
+
+from noddle_trader.strategy import ICTMSSStrategy
+
+
+@pytest.fixture
+def estrategia(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    estrategia = ICTMSSStrategy({})
+    yield estrategia
+    estrategia.close()
+
+
+def test_estadisticas_por_tipo_de_entrada(estrategia):
+    estrategia.registrar_operacion(
+        {"resultado": "ganancia", "distancia_sl": 0.001, "razon_entrada": "CE 50%"}
+    )
+    estrategia.registrar_operacion(
+        {"resultado": "perdida", "distancia_sl": 0.002, "tipo_entrada": "ifvg"}
+    )
+    # razon_entrada puede venir como None
+    estrategia.registrar_operacion(
+        {"resultado": "pendiente", "tipo_entrada": "ifvg", "razon_entrada": None}
+    )
+    stats = estrategia.obtener_estadisticas()
+    assert stats["total_operaciones"] == 3
+    assert stats["ganadas"] == 1
+    assert (stats["operaciones_fvg"], stats["operaciones_ifvg"]) == (1, 2)
+    assert stats["operaciones_ce"] == 1
+
+
+@pytest.mark.parametrize(
+    "operacion, error",
+    [
+        ({"resultado": "ganancia"}, KeyError),
+        ({"resultado": "perdida", "distancia_sl": None}, TypeError),
+    ],
+)
+def test_operacion_invalida_no_queda_registrada(estrategia, operacion, error):
+    estrategia.registrar_operacion({"resultado": "perdida", "distancia_sl": 0.001})
+    antes = estrategia.obtener_estadisticas()
+    with pytest.raises(error):
+        estrategia.registrar_operacion(operacion)
+    assert estrategia.obtener_estadisticas() == antes
+    assert len(estrategia.operaciones) == 1
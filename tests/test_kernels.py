@@ -0,0 +1,179 @@
+# test_kernels.py
+"""
+Kernels numéricos de la estrategia
+
+Las dos implementaciones de cada kernel (bucle, compilado con Numba si
+está instalado, y versión NumPy) deben dar exactamente el mismo resultado
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from noddle_trader import _kernels
+
+SEMILLAS = range(20)
+
+
+def _velas(seed: int, n: int, dtype=np.float64):
+    """highs, lows y closes de una serie aleatoria de n velas"""
+    rng = np.random.default_rng(seed)
+    closes = 1.1 + np.cumsum(rng.normal(0, 4e-4, n))
+    opens = np.r_[closes[:1], closes[:-1]]
+    highs = np.maximum(opens, closes) + np.abs(rng.normal(0, 3e-4, n))
+    lows = np.minimum(opens, closes) - np.abs(rng.normal(0, 3e-4, n))
+    return highs.astype(dtype), lows.astype(dtype), closes.astype(dtype)
+
+
+def test_simular_salida_bucle():
+    simular = _kernels._simular_salida_bucle
+    lows = np.array([1.09, 1.08, 1.07])
+    highs = np.array([1.11, 1.12, 1.13])
+    # Compra: el TP (1.12) llega en la segunda vela, antes que el SL (1.07)
+    assert simular(lows, highs, 1.07, 1.12, True) == _kernels.GANANCIA
+    # Venta: el SL (1.12) llega en la segunda vela, antes que el TP (1.07)
+    assert simular(lows, highs, 1.12, 1.07, False) == _kernels.PERDIDA
+    assert simular(lows, highs, 1.0, 1.2, True) == _kernels.PENDIENTE
+    assert simular(lows[:0], highs[:0], 1.0, 1.2, True) == _kernels.PENDIENTE
+
+
+def test_simular_salida_sl_y_tp_en_la_misma_vela():
+    lows, highs = np.array([1.0]), np.array([2.0])
+    for simular in (_kernels._simular_salida_bucle, _kernels._simular_salida_np):
+        assert simular(lows, highs, 1.5, 1.6, True) == _kernels.PERDIDA
+        assert simular(lows, highs, 1.6, 1.5, False) == _kernels.PERDIDA
+
+
+@pytest.mark.parametrize("seed", SEMILLAS)
+@pytest.mark.parametrize("es_compra", [True, False])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_simular_salida(seed, es_compra, dtype):
+    highs, lows, closes = _velas(seed, 200, dtype)
+    rng = np.random.default_rng(seed)
+    entrada = float(closes[0])
+    distancia = rng.uniform(2e-4, 3e-3)
+    signo = 1 if es_compra else -1
+    # SL y TP en el dtype de los precios, como los pasa la estrategia
+    precio = np.dtype(dtype).type
+    sl = precio(entrada - signo * distancia)
+    tp = precio(entrada + signo * 2 * distancia)
+    for n in (0, 1, 10, 200):
+        args = (lows[:n], highs[:n], sl, tp, es_compra)
+        assert _kernels._simular_salida_bucle(*args) == _kernels._simular_salida_np(
+            *args
+        )
+
+
+def _comparar_fvg(highs, lows, alcista, rango_minimo, ancho_minimo):
+    args = (highs, lows, alcista, rango_minimo, ancho_minimo)
+    i_bucle, descartados_bucle = _kernels._detectar_fvg_bucle(*args)
+    i_np, descartados_np = _kernels._detectar_fvg_np(*args)
+    np.testing.assert_array_equal(i_bucle, i_np)
+    assert descartados_bucle == descartados_np
+    return i_bucle
+
+
+@pytest.mark.parametrize("seed", SEMILLAS)
+@pytest.mark.parametrize("alcista", [True, False])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_detectar_fvg(seed, alcista, dtype):
+    highs, lows, _ = _velas(seed, 150, dtype)
+    # Umbrales en el dtype de los precios, como los pasa la estrategia
+    precio = np.dtype(dtype).type
+    for rango_minimo, ancho_minimo in ((0.0, 0.0), (3e-4, 1e-4)):
+        indices = _comparar_fvg(
+            highs, lows, alcista, precio(rango_minimo), precio(ancho_minimo)
+        )
+        # De la terna más reciente (len - 5) a la más antigua (3)
+        assert np.all(np.diff(indices) < 0)
+        assert np.all((indices >= 3) & (indices <= len(highs) - 5))
+
+
+@pytest.mark.parametrize("seed", SEMILLAS)
+def test_detectar_fvg_series_cortas(seed):
+    # Los cortes desplazados de la versión NumPy en los bordes de la serie
+    highs, lows, _ = _velas(seed, 12)
+    for n in range(len(highs) + 1):
+        for alcista in (True, False):
+            indices = _comparar_fvg(highs[:n], lows[:n], alcista, 0.0, 0.0)
+            assert np.all((indices >= 3) & (indices <= n - 5))
+
+
+@pytest.mark.parametrize("seed", SEMILLAS)
+def test_buscar_entrada(seed):
+    rng = np.random.default_rng(seed)
+    n = 12
+    bajos = 1.1 + rng.normal(0, 1e-3, n)
+    altos = bajos + rng.uniform(1e-5, 5e-4, n)
+    compras = rng.random(n) < 0.5
+    for _ in range(50):
+        r_low = 1.1 + rng.normal(0, 1e-3)
+        r_high = r_low + rng.uniform(0, 5e-4)
+        r_close = rng.uniform(r_low, r_high)
+        for k in (0, 1, n):
+            args = (altos[:k], bajos[:k], compras[:k], r_high, r_low, r_close, 1e-4)
+            bucle = _kernels._buscar_entrada_bucle(*args)
+            vectorizado = _kernels._buscar_entrada_np(*args)
+            assert tuple(bucle) == tuple(vectorizado)
+
+
+def test_buscar_entrada_orden_de_las_reglas():
+    # Una compra con el hueco en [1.1000, 1.1010]; (r_high, r_low, r_close)
+    casos = [
+        ((1.1020, 1.1008, 1.1015), (0, _kernels.MITIGACION)),
+        # Sin tocar el hueco, a menos de la tolerancia: proximidad
+        ((1.1030, 1.10105, 1.1020), (0, _kernels.PROXIMIDAD)),
+        ((1.1030, 1.1020, 1.1025), (-1, _kernels.SIN_ENTRADA)),
+    ]
+    altos, bajos, compras = np.array([1.1010]), np.array([1.1000]), np.array([True])
+    for buscar in (_kernels._buscar_entrada_bucle, _kernels._buscar_entrada_np):
+        for vela, esperado in casos:
+            assert tuple(buscar(altos, bajos, compras, *vela, 1e-4)) == esperado
+
+
+@pytest.mark.parametrize("seed", SEMILLAS)
+@pytest.mark.parametrize("periodo", [1, 3, 14])
+def test_atr(seed, periodo):
+    highs, lows, closes = _velas(seed, 120)
+    for n in (0, 1, periodo - 1, periodo, 120):
+        args = (highs[:n], lows[:n], closes[:n], periodo)
+        np.testing.assert_array_equal(
+            _kernels._atr_bucle(*args), _kernels._atr_np(*args)
+        )
+
+
+def test_atr_igual_a_pandas():
+    # El cálculo con Series que reemplazó el kernel
+    highs, lows, closes = _velas(0, 120)
+    df = pd.DataFrame({"high": highs, "low": lows, "close": closes})
+    previo = df["close"].shift()
+    tr = pd.concat(
+        [
+            df["high"] - df["low"],
+            (df["high"] - previo).abs(),
+            (df["low"] - previo).abs(),
+        ],
+        axis=1,
+    ).max(axis=1)
+    esperado = tr.rolling(14).mean().fillna(tr)
+    np.testing.assert_array_equal(
+        _kernels.atr(highs, lows, closes, 14), esperado.to_numpy()
+    )
+
+
+@pytest.mark.parametrize("seed", SEMILLAS)
+@pytest.mark.parametrize("periodo", [1, 3, 14])
+def test_atr_actual(seed, periodo):
+    highs, lows, closes = _velas(seed, 60)
+    for n in sorted({1, 2, max(periodo - 1, 1), periodo, 60}):
+        args = (highs[:n], lows[:n], closes[:n], periodo)
+        bucle = _kernels._atr_actual_bucle(*args)
+        assert bucle == _kernels._atr_actual_np(*args)
+        # Es el último valor de la serie completa
+        assert bucle == pytest.approx(_kernels._atr_np(*args)[-1], rel=1e-12)
+
+
+def test_atr_actual_sin_velas():
+    vacio = np.empty(0)
+    assert _kernels._atr_actual_bucle(vacio, vacio, vacio, 14) == 0.0
+    assert _kernels._atr_actual_np(vacio, vacio, vacio, 14) == 0.0
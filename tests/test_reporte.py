@@ -0,0 +1,130 @@
+# test_reporte.py
+"""Reporte consolidado: estado acumulado, estado guardado y recorrido completo"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from noddle_trader import strategy
+from noddle_trader.strategy import RESUMENES_JSONL, ICTMSSStrategy
+
+CONFIG = {"VELAS_M15": 20, "FVG_MIN_PCT_ATR": 0.0, "UMBRAL_SESION": 0.0}
+
+
+def _velas(seed: int, n: int, freq: str, vol: float) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range("2024-01-02", periods=n, freq=freq, tz="UTC", name="time")
+    close = 1.1 + np.cumsum(rng.normal(0, vol, n))
+    open_ = np.r_[close[0], close[:-1]]
+    high = np.maximum(open_, close) + np.abs(rng.normal(0, vol, n))
+    low = np.minimum(open_, close) - np.abs(rng.normal(0, vol, n))
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close}, index=idx
+    )
+
+
+M15 = _velas(3, 300, "15min", 8e-4)
+M1 = _velas(4, 3000, "1min", 4e-4)
+
+
+def _analizar(estrategia: ICTMSSStrategy, desde: int, hasta: int):
+    for t in range(desde, hasta, 13):
+        k = 40 + t // 15
+        estrategia.analizar_mercado(M15.iloc[k - 25 : k], M1.iloc[t - 100 : t])
+
+
+def _reporte(estrategia: ICTMSSStrategy) -> dict:
+    reporte = estrategia.generar_reporte_analisis()
+    estrategia.close()
+    reporte.pop("generado_en")
+    return reporte
+
+
+def _recorrido_completo(output) -> dict:
+    """Reporte de una instancia sin estado guardado ni resúmenes JSONL"""
+    (output / ".estado_reporte.toml").unlink(missing_ok=True)
+    (output / RESUMENES_JSONL).unlink(missing_ok=True)
+    return _reporte(ICTMSSStrategy(CONFIG))
+
+
+@pytest.fixture(autouse=True)
+def directorio(monkeypatch, tmp_path):
+    """Cada prueba escribe su carpeta output en tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "output"
+
+
+def test_acumulado_igual_a_recorrido_completo(directorio):
+    estrategia = ICTMSSStrategy(CONFIG)
+    _analizar(estrategia, 150, 700)
+    reporte = _reporte(estrategia)
+    assert reporte["total_analisis"] > 0
+    assert _recorrido_completo(directorio) == reporte
+
+
+def test_archivo_borrado_rehace_el_reporte(directorio):
+    estrategia = ICTMSSStrategy(CONFIG)
+    _analizar(estrategia, 150, 500)
+    reporte = _reporte(estrategia)
+    sorted(directorio.glob("analysis_*.toml"))[0].unlink()
+
+    reporte_nuevo = _reporte(ICTMSSStrategy(CONFIG))
+    assert reporte_nuevo["total_analisis"] == reporte["total_analisis"] - 1
+    assert _recorrido_completo(directorio) == reporte_nuevo
+
+
+def test_estado_guardado_igual_a_recorrido_completo(directorio):
+    escritora = ICTMSSStrategy(CONFIG)
+    _analizar(escritora, 150, 700)
+    reporte = _reporte(escritora)
+    assert reporte["total_analisis"] > 0
+
+    # Otra instancia retoma el estado guardado y suma sus propios análisis
+    retomada = ICTMSSStrategy(CONFIG)
+    assert _reporte(retomada) == reporte
+    # Sigue la numeración para no sobrescribir archivos del mismo segundo
+    retomada.analysis_counter = escritora.analysis_counter
+    _analizar(retomada, 700, 1000)
+    reporte_retomado = _reporte(retomada)
+    assert reporte_retomado["total_analisis"] > reporte["total_analisis"]
+
+    assert _recorrido_completo(directorio) == reporte_retomado
+
+
+def test_estado_corrupto_se_ignora(directorio):
+    estrategia = ICTMSSStrategy(CONFIG)
+    _analizar(estrategia, 150, 400)
+    reporte = _reporte(estrategia)
+    (directorio / ".estado_reporte.toml").write_text("x = = 1")
+    assert _reporte(ICTMSSStrategy(CONFIG)) == reporte
+
+
+def test_resumenes_jsonl_evitan_leer_los_toml(directorio, monkeypatch):
+    estrategia = ICTMSSStrategy(CONFIG)
+    _analizar(estrategia, 150, 400)
+    reporte = _reporte(estrategia)
+    (directorio / ".estado_reporte.toml").unlink()
+
+    leidos = []
+    load = strategy.tomllib.load
+    monkeypatch.setattr(
+        strategy.tomllib, "load", lambda f: leidos.append(f.name) or load(f)
+    )
+    assert _reporte(ICTMSSStrategy(CONFIG)) == reporte
+    assert leidos == []
+
+    # Sin el JSONL (archivos de versiones anteriores) se leen los TOML
+    (directorio / ".estado_reporte.toml").unlink()
+    (directorio / RESUMENES_JSONL).unlink()
+    assert _reporte(ICTMSSStrategy(CONFIG)) == reporte
+    assert len(leidos) == reporte["total_analisis"]
+
+
+def test_reporte_en_cache_no_se_modifica_desde_fuera():
+    estrategia = ICTMSSStrategy(CONFIG)
+    _analizar(estrategia, 150, 300)
+    primero = estrategia.generar_reporte_analisis()
+    primero["sesgos_detectados"]["alcista"] = -1
+    segundo = estrategia.generar_reporte_analisis()
+    assert segundo["sesgos_detectados"]["alcista"] >= 0
+    estrategia.close()
@@ -0,0 +1,47 @@
+# test_swing.py
+"""Swing high/low incremental de la ventana de M15"""
+
+import numpy as np
+import pytest
+
+from noddle_trader.strategy import _SwingRolling
+
+VENTANA = 10
+
+
+def _serie(seed: int, n: int):
+    rng = np.random.default_rng(seed)
+    tiempos = np.arange(n, dtype=np.int64) * 900
+    lows = 1.1 + np.cumsum(rng.normal(0, 4e-4, n))
+    highs = lows + rng.uniform(1e-5, 8e-4, n)
+    return tiempos, highs, lows
+
+
+def _esperado(highs, lows):
+    inicio = len(highs) - min(VENTANA, len(highs))
+    return highs[inicio:].max(), lows[inicio:].min()
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_swing_igual_a_recorrer_la_ventana(seed):
+    tiempos, highs, lows = _serie(seed, 200)
+    rng = np.random.default_rng(seed)
+    swing = _SwingRolling(VENTANA)
+    fin = 1
+    while fin <= len(tiempos):
+        largo = int(rng.integers(1, 2 * VENTANA))
+        inicio = max(fin - largo, 0)
+        args = (tiempos[inicio:fin], highs[inicio:fin], lows[inicio:fin])
+        assert swing.actualizar(*args) == _esperado(*args[1:])
+        fin += int(rng.integers(0, VENTANA + 3))  # También huecos y repeticiones
+
+
+def test_swing_vela_cerrada_corregida():
+    tiempos, highs, lows = _serie(0, 30)
+    swing = _SwingRolling(VENTANA)
+    swing.actualizar(tiempos, highs, lows)
+    # Mismos tiempos, pero el broker corrige la última vela cerrada
+    highs, lows = highs.copy(), lows.copy()
+    highs[-2] += 0.01
+    lows[-2] -= 0.01
+    assert swing.actualizar(tiempos, highs, lows) == _esperado(highs, lows)